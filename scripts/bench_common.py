@@ -0,0 +1,60 @@
+"""Shared helpers for the offline benchmark scripts."""
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Sequence
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT / "src") not in sys.path:
+    sys.path.append(str(ROOT / "src"))
+
+SAMPLES = [
+    "환불 요청합니다. 주문번호는 ORD-39422 입니다. 지난주에 받았는데 제품에 문제가 있어요.",
+    "지난주에 주문한 ORD-30110 배송이 아직도 안 왔는데 환불 가능한가요?",
+    "ORD-78901 주문 상태 어떻게 되나요? 배송 시작했나요?",
+    "주문번호 잊었는데 지난달 주문한 커피머신 상태 좀 확인해주세요.",
+]
+
+
+def use_fake_llm(latency_ms: float = 0.0, ms_per_1k_tokens: float = 0.0) -> None:
+    """Route every Gemini call to the offline fake model."""
+
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(latency_ms)
+    os.environ["FAKE_LLM_MS_PER_1K_TOKENS"] = str(ms_per_1k_tokens)
+    from poc_langraph_agent.runtime.llm import get_gemini
+
+    get_gemini.cache_clear()
+
+
+@contextmanager
+def sandbox_datastore() -> Iterator[Path]:
+    """Point the datastore at a throwaway copy of ``src/assets``."""
+
+    from poc_langraph_agent.runtime import datastore
+
+    original = (datastore.ORDERS_PATH, datastore.REFUNDS_PATH)
+    with tempfile.TemporaryDirectory(prefix="poc-bench-") as tmp:
+        assets = Path(tmp) / "assets"
+        shutil.copytree(original[0].parent, assets)
+        datastore.ORDERS_PATH = assets / original[0].name
+        datastore.REFUNDS_PATH = assets / original[1].name
+        datastore.invalidate_order_index()
+        try:
+            yield assets
+        finally:
+            datastore.ORDERS_PATH, datastore.REFUNDS_PATH = original
+            datastore.invalidate_order_index()
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered: List[float] = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
@@ -0,0 +1,91 @@
+"""Offline benchmark of agent prompt size and latency: legacy vs compacted payloads.
+
+The legacy mode reproduces the previous ``indent=2`` dumps of full records;
+the compact mode uses ``runtime.compaction``. Both run ``run_router`` against
+the fake model, whose simulated latency grows with prompt tokens.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Tuple
+
+from bench_common import SAMPLES, percentile, sandbox_datastore, use_fake_llm  # also puts src/ on sys.path
+
+from poc_langraph_agent.runtime.compaction import estimate_tokens
+from poc_langraph_agent.runtime.router import run_router
+from poc_langraph_agent.tools import nodes
+
+
+def _legacy_variables(agent: str, data: Mapping[str, Any]) -> Tuple[Dict[str, str], Dict[str, int]]:
+    rendered = {
+        name: json.dumps(value, ensure_ascii=False, indent=2) if value else "{}"
+        for name, value in data.items()
+    }
+    tokens = sum(estimate_tokens(text) for text in rendered.values())
+    return rendered, {"variables_tokens_est": tokens, "variables_tokens_projected": tokens}
+
+
+def _inflate_orders(assets: Path, items_per_order: int) -> None:
+    """Pad every order to ``items_per_order`` items to mimic large carts."""
+
+    path = assets / "orders.json"
+    orders = json.loads(path.read_text(encoding="utf-8"))
+    filler = {"sku": "SKU-0000", "name": "상품", "qty": 1, "price": 1000}
+    for order in orders:
+        templates = list(order.get("items") or [filler])
+        items = order["items"] = list(order.get("items") or [])
+        while len(items) < items_per_order:
+            template = templates[len(items) % len(templates)]
+            items.append({**template, "sku": f"{template['sku']}-{len(items)}"})
+    path.write_text(json.dumps(orders, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def _run(mode: str, iterations: int, items_per_order: int) -> Tuple[Dict[str, List[int]], List[float]]:
+    original = nodes.compact_variables
+    if mode == "legacy":
+        nodes.compact_variables = _legacy_variables
+    sizes: Dict[str, List[int]] = defaultdict(list)
+    latencies: List[float] = []
+    try:
+        with sandbox_datastore() as assets:
+            if items_per_order:
+                _inflate_orders(assets, items_per_order)
+            for index in range(iterations):
+                start = time.perf_counter()
+                state = run_router(SAMPLES[index % len(SAMPLES)])
+                latencies.append((time.perf_counter() - start) * 1000)
+                for entry in state.payload.get("trace", []):
+                    if isinstance(entry, dict) and "prompt" in entry:
+                        sizes[entry["node"]].append(entry["prompt"]["prompt_tokens_est"])
+    finally:
+        nodes.compact_variables = original
+    return sizes, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Fake model base latency")
+    parser.add_argument(
+        "--ms-per-1k-tokens", type=float, default=20.0, help="Fake model latency per 1k prompt tokens"
+    )
+    parser.add_argument("--items", type=int, default=0, help="Pad each order to this many items")
+    args = parser.parse_args()
+    use_fake_llm(args.latency_ms, args.ms_per_1k_tokens)
+
+    for mode in ("legacy", "compact"):
+        sizes, latencies = _run(mode, args.iterations, args.items)
+        print(f"[{mode}] requests={len(latencies)}")
+        for agent, values in sorted(sizes.items()):
+            print(f"  {agent:<20} prompt tokens avg={sum(values) / len(values):7.1f} max={max(values)}")
+        print(
+            f"  latency ms p50={percentile(latencies, 50):.1f} p99={percentile(latencies, 99):.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark per-request CPU spent on Pydantic (de)serialization in the router state.
+
+Compares the current pipeline, which hands validated model instances from the
+intent chain to the planner and validates ``RouterState`` once, against the
+previous serialize->parse round trips (``.json()`` + ``PydanticOutputParser``
+in intent/planner, repeated dumps for payload and trace). No LLM is involved:
+only the state-shaping work around the agents is measured.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Callable, Dict
+
+from bench_common import SAMPLES  # also puts src/ on sys.path
+
+from langchain_core.output_parsers import PydanticOutputParser
+
+from poc_langraph_agent.intent import build_intent_chain
+from poc_langraph_agent.runtime.planner import build_planner_chain
+from poc_langraph_agent.runtime.safety import mask_pii
+from poc_langraph_agent.schemas import IntentPayload, Plan, RouterState
+
+
+def _current(text: str, intent_chain, planner_chain) -> RouterState:
+    masked, pii = mask_pii(text)
+    intent: IntentPayload = intent_chain.invoke({"masked_input": masked, "pii_types": pii})
+    plan: Plan = planner_chain.invoke({"intent": intent})
+    payload: Dict[str, Any] = {"query": masked, "trace": [{"plan": plan.model_dump()}]}
+    intent_data = payload.setdefault("intent", intent.model_dump())
+    payload.setdefault("slots", intent_data["slots"])
+    state = {"raw_input": text, "masked_input": masked, "intent": intent, "plan": plan, "payload": payload}
+    return RouterState.model_validate(state)
+
+
+def _legacy(text: str, intent_chain, planner_chain) -> RouterState:
+    intent_parser = PydanticOutputParser(pydantic_object=IntentPayload)
+    plan_parser = PydanticOutputParser(pydantic_object=Plan)
+    masked, pii = mask_pii(text)
+    intent = intent_chain.invoke({"masked_input": masked, "pii_types": pii})
+    intent = intent_parser.parse(intent.model_dump_json())
+    plan = planner_chain.invoke({"intent": intent})
+    plan = plan_parser.parse(plan.model_dump_json())
+    payload: Dict[str, Any] = {"query": masked, "trace": [{"plan": plan.model_dump()}]}
+    payload.setdefault("intent", intent.model_dump())
+    payload.setdefault("slots", intent.slots.model_dump())
+    state = {
+        "raw_input": text,
+        "masked_input": masked,
+        "intent": intent.model_dump(),
+        "plan": plan.model_dump(),
+        "payload": payload,
+    }
+    return RouterState.model_validate(state)
+
+
+def _measure(fn: Callable[..., RouterState], iterations: int) -> float:
+    intent_chain = build_intent_chain()
+    planner_chain = build_planner_chain()
+    for text in SAMPLES:
+        fn(text, intent_chain, planner_chain)
+    start = time.process_time()
+    for index in range(iterations):
+        fn(SAMPLES[index % len(SAMPLES)], intent_chain, planner_chain)
+    return (time.process_time() - start) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    legacy = _measure(_legacy, args.iterations)
+    current = _measure(_current, args.iterations)
+    print(f"requests: {args.iterations}")
+    print(f"legacy  CPU/request: {legacy * 1e6:8.1f} us")
+    print(f"current CPU/request: {current * 1e6:8.1f} us")
+    print(f"speedup: {legacy / current:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Closed-loop load generator for ``poc_langraph_agent.serve``.
+
+Each client thread keeps one HTTP/1.1 keep-alive connection and sends
+requests back to back. With ``--spawn`` the script starts the service itself
+on the offline fake model against a throwaway copy of the datastore, so QPS
+and p50/p99 can be measured on one machine without API keys.
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Tuple
+
+from bench_common import ROOT, SAMPLES, percentile  # also puts src/ on sys.path
+
+
+def _client(host: str, port: int, deadline: float, offset: int, results: List[Tuple[float, int]]) -> None:
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    index = offset
+    while time.perf_counter() < deadline:
+        body = json.dumps({"input": SAMPLES[index % len(SAMPLES)]}, ensure_ascii=False).encode("utf-8")
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/route", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+            status = 0
+        results.append(((time.perf_counter() - start) * 1000, status))
+        index += 1
+    conn.close()
+
+
+def _wait_ready(host: str, port: int, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        conn = http.client.HTTPConnection(host, port, timeout=1)
+        try:
+            conn.request("GET", "/healthz")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        time.sleep(0.2)
+    raise RuntimeError("service did not become ready")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--spawn", action="store_true", help="Start the service on the fake model")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--fake-latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    server = None
+    tmp = None
+    if args.spawn:
+        tmp = tempfile.mkdtemp(prefix="poc-loadgen-")
+        shutil.copytree(ROOT / "src" / "assets", Path(tmp) / "assets")
+        env = dict(
+            os.environ,
+            PYTHONPATH=str(ROOT / "src"),
+            LLM_BACKEND="fake",
+            FAKE_LLM_LATENCY_MS=str(args.fake_latency_ms),
+            POC_ASSETS_DIR=str(Path(tmp) / "assets"),
+        )
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "poc_langraph_agent.serve",
+                "--host",
+                args.host,
+                "--port",
+                str(args.port),
+                "--workers",
+                str(args.workers),
+                "--concurrency",
+                str(args.concurrency),
+            ],
+            env=env,
+        )
+    try:
+        _wait_ready(args.host, args.port)
+        results: List[Tuple[float, int]] = []
+        deadline = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(target=_client, args=(args.host, args.port, deadline, offset, results))
+            for offset in range(args.clients)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    ok = [latency for latency, status in results if status == 200]
+    statuses = Counter(status for _, status in results if status != 200)
+    errors = ", ".join(f"{status}x{count}" for status, count in sorted(statuses.items())) or "none"
+    print(f"clients={args.clients} duration={elapsed:.1f}s requests={len(results)} errors={errors}")
+    print(f"QPS={len(ok) / elapsed:.1f} p50={percentile(ok, 50):.1f}ms p99={percentile(ok, 99):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
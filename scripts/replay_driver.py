@@ -0,0 +1,123 @@
+"""Replay a recorded LLM cassette through ``run_router`` at a target QPS.
+
+Record a corpus first, e.g.::
+
+    LLM_CASSETTE_MODE=record LLM_CASSETTE_PATH=corpus.jsonl.gz \\
+        python -m poc_langraph_agent.cli "ORD-78901 주문 상태 어떻게 되나요?"
+
+then replay it offline::
+
+    python scripts/replay_driver.py corpus.jsonl.gz --qps 20 --duration 30 --out v2.json
+    python scripts/replay_driver.py corpus.jsonl.gz --qps 20 --duration 30 --compare v2.json
+
+Requests are issued open-loop on a fixed schedule and latency is measured
+from the scheduled start, so queueing under overload is counted rather than
+hidden. The user queries come from the cassette itself unless ``--inputs``
+is given. The datastore is a throwaway copy.
+"""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from bench_common import percentile, sandbox_datastore  # also puts src/ on sys.path
+
+from poc_langraph_agent.runtime.cassette import Cassette, read_exchanges, use_cassette
+from poc_langraph_agent.runtime.router import get_router_graph, run_router
+
+
+def _corpus(cassette: Path, inputs: Path | None) -> List[str]:
+    if inputs is not None:
+        return [line.strip() for line in inputs.read_text(encoding="utf-8").splitlines() if line.strip()]
+    queries: List[str] = []
+    for exchange in read_exchanges(cassette):
+        query = exchange.get("query")
+        # Every plan starts with order_agent, so its exchanges give one query per request.
+        if query and exchange.get("system") == "order_agent_system" and query not in queries:
+            queries.append(query)
+    if not queries:
+        raise SystemExit(f"No order_agent exchanges with a query in {cassette}")
+    return queries
+
+
+def _timed(scheduled: float, text: str) -> tuple[float, bool]:
+    try:
+        run_router(text)
+        ok = True
+    except Exception:
+        ok = False
+    return (time.perf_counter() - scheduled) * 1000, ok
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    corpus = _corpus(args.cassette, args.inputs)
+    cassette = Cassette(args.cassette, "replay", latency_scale=args.latency_scale, strict=args.strict)
+    use_cassette(cassette)
+    get_router_graph()
+
+    total = int(args.qps * args.duration)
+    interval = 1.0 / args.qps
+    futures: List[concurrent.futures.Future] = []
+    with sandbox_datastore(), concurrent.futures.ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        for index in range(total):
+            scheduled = wall_start + index * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(_timed, scheduled, corpus[index % len(corpus)]))
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+    latencies = [latency for latency, ok in results if ok]
+    rates = cassette.stats.rates()
+    return {
+        "requests": total,
+        "errors": total - len(latencies),
+        "target_qps": args.qps,
+        "achieved_qps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "cpu_ms_per_request": round(cpu * 1000 / max(1, total), 2),
+        "latency_scale": args.latency_scale,
+        # Share of calls served by another exchange of the same agent: not a faithful replay.
+        "fallback_rate": rates["fallback_rate"],
+        # Share of calls whose prompt variables changed since recording.
+        "prompt_changed_rate": rates["prompt_changed_rate"],
+        "replay": cassette.report(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cassette", type=Path)
+    parser.add_argument("--qps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of scheduled load")
+    parser.add_argument("--concurrency", type=int, default=32, help="Max in-flight requests")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Scale recorded LLM latencies")
+    parser.add_argument("--strict", action="store_true", help="Fail calls with no exact cassette match")
+    parser.add_argument("--inputs", type=Path, help="File with one user utterance per line")
+    parser.add_argument("--out", type=Path, help="Write the summary JSON here")
+    parser.add_argument("--compare", type=Path, help="Baseline summary JSON to diff against")
+    args = parser.parse_args()
+
+    summary = run(args)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.out:
+        args.out.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        for key in ("achieved_qps", "p50_ms", "p99_ms", "cpu_ms_per_request"):
+            before, after = baseline.get(key), summary[key]
+            if before:
+                print(f"{key:<20} {before:>10} -> {after:>10} ({(after - before) / before * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
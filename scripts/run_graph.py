@@ -19,4 +19,4 @@ if __name__ == "__main__":
     load_dotenv(dotenv_path)
     sample = "환불 요청합니다. 주문번호는 ORD-39422 이고 지난주 결제했습니다."
     result = run_router(sample)
-    print(json.dumps(result.dict(), ensure_ascii=False, indent=2))
+    print(json.dumps(result.model_dump(mode="json"), ensure_ascii=False, indent=2))
@@ -0,0 +1,94 @@
+"""Multi-process stress test for the JSON datastore.
+
+Each worker process records refunds for its own set of order IDs as fast as
+it can, all against one temporary datastore. Afterwards every write must be
+present (no lost updates) and every shard must still parse. Repeats for each
+shard count and reports write throughput.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from bench_common import ROOT  # also puts src/ on sys.path
+
+from poc_langraph_agent.runtime import datastore
+
+
+def _configure(assets: Path, shards: int) -> None:
+    datastore.ORDERS_PATH = assets / "orders.json"
+    datastore.REFUNDS_PATH = assets / "refunds.json"
+    datastore.SHARD_COUNT = shards
+    datastore._SEEDED.clear()
+
+
+def _writer(assets: str, shards: int, worker: int, writes: int) -> None:
+    _configure(Path(assets), shards)
+    for index in range(writes):
+        datastore.record_refund(f"ORD-W{worker:02d}N{index:05d}", "approve", [f"worker {worker}"])
+
+
+def _run(shards: int, processes: int, writes: int) -> float:
+    tmp = Path(tempfile.mkdtemp(prefix="poc-stress-"))
+    try:
+        assets = tmp / "assets"
+        shutil.copytree(ROOT / "src" / "assets", assets)
+        _configure(assets, shards)
+        seeded = len(datastore.load_refunds())
+
+        ctx = multiprocessing.get_context("fork")
+        workers: List[multiprocessing.Process] = [
+            ctx.Process(target=_writer, args=(str(assets), shards, worker, writes))
+            for worker in range(processes)
+        ]
+        started = time.perf_counter()
+        for proc in workers:
+            proc.start()
+        for proc in workers:
+            proc.join()
+        elapsed = time.perf_counter() - started
+        if any(proc.exitcode for proc in workers):
+            raise SystemExit(f"shards={shards}: a writer process failed")
+
+        for path in datastore.shard_paths(datastore.REFUNDS_PATH):
+            json.loads(path.read_text(encoding="utf-8"))
+        refunds = datastore.load_refunds()
+        expected = seeded + processes * writes
+        missing = [
+            f"ORD-W{worker:02d}N{index:05d}"
+            for worker in range(processes)
+            for index in range(writes)
+            if f"ORD-W{worker:02d}N{index:05d}" not in refunds
+        ]
+        status = "OK" if not missing and len(refunds) == expected else f"LOST {len(missing)}"
+        throughput = processes * writes / elapsed
+        print(
+            f"shards={shards:<3} processes={processes} writes={processes * writes:<6} "
+            f"{throughput:8.1f} writes/s  records={len(refunds)}/{expected}  {status}"
+        )
+        return throughput
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=100, help="Writes per process")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+    if sys.platform == "win32":
+        raise SystemExit("stress test needs fork() and fcntl locks")
+    for shards in args.shards:
+        _run(shards, args.processes, args.writes)
+
+
+if __name__ == "__main__":
+    main()
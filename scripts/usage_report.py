@@ -0,0 +1,35 @@
+"""Run the sample corpus and print token/latency/cost totals per plan and agent.
+
+Uses the fake model unless ``--live`` is given. Compare policies by setting
+``MODEL_POLICY`` (JSON or a path to a JSON file) between runs.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+
+from bench_common import SAMPLES, sandbox_datastore, use_fake_llm  # also puts src/ on sys.path
+
+from poc_langraph_agent.runtime.model_policy import get_model_policy
+from poc_langraph_agent.runtime.router import run_router
+from poc_langraph_agent.runtime.usage import USAGE_LEDGER
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=len(SAMPLES))
+    parser.add_argument("--live", action="store_true", help="Call Gemini instead of the fake model")
+    args = parser.parse_args()
+    if not args.live:
+        use_fake_llm()
+
+    with sandbox_datastore():
+        for index in range(args.iterations):
+            run_router(SAMPLES[index % len(SAMPLES)])
+
+    report = {"policy": get_model_policy().describe(), "plans": USAGE_LEDGER.report()}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,15 @@ from __future__ import annotations
 
 import argparse
 import json
+import sys
+from contextlib import nullcontext
 from pathlib import Path
 
 from dotenv import find_dotenv, load_dotenv
 
+from .runtime.profiling import profile_router
 from .runtime.router import run_router
+from .tools.nodes import DeadlineExceededError
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
 
@@ -19,15 +23,62 @@ def main() -> None:
     parser = argparse.ArgumentParser(description="Run the MCP router against a user input")
     parser.add_argument("prompt", nargs="?", help="User utterance to route")
     parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON output")
+    parser.add_argument("--deadline-ms", type=int, help="End-to-end request deadline in milliseconds")
+    parser.add_argument("--session-id", help="Conversation id for multi-turn context")
+    parser.add_argument("--customer", help="Caller's email, used to resolve orders named without an id")
+    parser.add_argument("--batch", type=Path, help="Route every line of this file (one utterance per line)")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="cprofile",
+        choices=["cprofile", "sampling"],
+        help="Profile the run(s); sampling is cheaper for large batches",
+    )
+    parser.add_argument(
+        "--profile-out",
+        default="router-profile",
+        help="Profile output prefix: writes <prefix>.txt and <prefix>.collapsed",
+    )
     args = parser.parse_args()
 
-    user_input = args.prompt or input("사용자 요청: ")
-
-    result = run_router(user_input)
-    if args.pretty:
-        print(json.dumps(result.dict(), ensure_ascii=False, indent=2))
+    if args.batch:
+        inputs = [line.strip() for line in args.batch.read_text(encoding="utf-8").splitlines() if line.strip()]
     else:
-        print(result.json(ensure_ascii=False))
+        inputs = [args.prompt or input("사용자 요청: ")]
+
+    deadline_missed = False
+    profiler = profile_router(args.profile) if args.profile else nullcontext()
+    with profiler:
+        for user_input in inputs:
+            try:
+                result = run_router(
+                    user_input,
+                    deadline_ms=args.deadline_ms,
+                    session_id=args.session_id,
+                    customer=args.customer,
+                )
+            except Exception as exc:
+                # Like the HTTP service's 504: a missed deadline is an answer, not a crash.
+                if not args.batch and not isinstance(exc, DeadlineExceededError):
+                    raise
+                deadline_missed = deadline_missed or isinstance(exc, DeadlineExceededError)
+                print(json.dumps({"raw_input": user_input, "error": str(exc)}, ensure_ascii=False))
+                continue
+            if args.pretty:
+                print(json.dumps(result.model_dump(mode="json"), ensure_ascii=False, indent=2))
+            else:
+                print(result.model_dump_json())
+
+    if args.profile:
+        profiler.write_report(f"{args.profile_out}.txt")
+        profiler.write_collapsed(f"{args.profile_out}.collapsed")
+        print(profiler.report(limit=15), file=sys.stderr)
+        print(
+            f"profile written to {args.profile_out}.txt and {args.profile_out}.collapsed",
+            file=sys.stderr,
+        )
+    if deadline_missed and not args.batch:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -4,7 +4,6 @@ from __future__ import annotations
 import re
 from typing import Dict, List
 
-from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.runnables import RunnableLambda
 
 from .schemas import IntentPayload, RouteCandidate, SafetyMetadata
@@ -15,6 +14,7 @@ _TIME_HINTS = {
     "어제": "yesterday",
     "지난주": "last_week",
     "지난 달": "last_month",
+    "지난달": "last_month",
 }
 
 
@@ -29,8 +29,6 @@ def _score_confidence(tokens: List[str]) -> float:
 
 
 def build_intent_chain():
-    parser = PydanticOutputParser(pydantic_object=IntentPayload)
-
     def _predict(payload: Dict[str, object]) -> IntentPayload:
         text = str(payload["masked_input"])
         pii_types = payload.get("pii_types", [])
@@ -76,7 +74,7 @@ def build_intent_chain():
 
         safety = SafetyMetadata(has_pii=bool(pii_types), pii_types=list(pii_types))
 
-        data = IntentPayload(
+        return IntentPayload(
             intent=intent,
             confidence=confidence,
             slots=slots,
@@ -84,6 +82,5 @@ def build_intent_chain():
             route_candidates=route_candidates,
             reason=reason,
         )
-        return parser.parse(data.json())
 
     return RunnableLambda(_predict)
@@ -0,0 +1,65 @@
+"""Per-attempt write guard used by the executor for timed-out agent calls."""
+from __future__ import annotations
+
+import contextvars
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterator
+
+
+class AttemptAbandonedError(RuntimeError):
+    """Raised in an abandoned attempt's thread instead of writing to the datastore."""
+
+
+class AttemptGuard:
+    """Keeps a timed-out attempt from writing to the datastore.
+
+    The executor stops waiting for an attempt at its timeout, but the handler
+    thread keeps running. Writes go through ``guarded_write()``: once the
+    executor has abandoned the attempt they raise instead, and once a write
+    has begun the executor waits for the attempt rather than reporting a
+    timeout.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._abandoned = False
+        self._committed = False
+
+    def run(
+        self, handler: Callable[[Dict[str, Any]], Dict[str, Any]], payload: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        token = _ATTEMPT_GUARD.set(self)
+        try:
+            return handler(payload)
+        finally:
+            _ATTEMPT_GUARD.reset(token)
+
+    @contextmanager
+    def commit(self) -> Iterator[None]:
+        with self._lock:
+            if self._abandoned:
+                raise AttemptAbandonedError("Attempt abandoned after its timeout; write skipped")
+            self._committed = True
+        yield
+
+    def abandon(self) -> bool:
+        """Mark the attempt abandoned; False if it has already written."""
+
+        with self._lock:
+            if self._committed:
+                return False
+            self._abandoned = True
+            return True
+
+
+_ATTEMPT_GUARD: contextvars.ContextVar[AttemptGuard | None] = contextvars.ContextVar(
+    "attempt_guard", default=None
+)
+
+
+def guarded_write() -> ContextManager[None]:
+    """Wrap a datastore write made by an agent handler (a no-op outside the executor)."""
+
+    guard = _ATTEMPT_GUARD.get()
+    return guard.commit() if guard is not None else nullcontext()
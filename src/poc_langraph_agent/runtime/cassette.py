@@ -0,0 +1,239 @@
+"""Record/replay of agent LLM exchanges for deterministic offline load tests.
+
+A cassette is a JSON-lines file (gzip-compressed when the name ends in
+``.gz``), one line per ``_call_structured_agent`` exchange: prompt template
+names, the user query, the replay key, a hash of the prompt variables, the
+rendered prompt, the raw response text, usage metadata and latency. Every exchange is appended with a single
+write (as its own gzip member for ``.gz``), so the file is readable at any
+time, even if the process is killed, and several processes may append to it.
+Replay serves the raw text back, so malformed-JSON responses fail exactly as
+they did live.
+
+Exchanges are keyed on the template names, the masked user query and the
+order id, not on the rendered records: replayed refunds change the sandbox
+datastore, and a key over record contents would stop matching. Replay still
+compares the variables hash and counts exchanges whose prompt content changed
+(``prompt_changed``). Repeats of a key replay the recorded responses in
+recording order; exchanges are ordered by time, then by the recording
+process's id and per-key sequence number, so cassettes appended to by several
+workers replay deterministically.
+
+Environment:
+    LLM_CASSETTE_MODE          "record" or "replay" (disabled if unset)
+    LLM_CASSETTE_PATH          cassette file (default: llm_cassette.jsonl.gz)
+    LLM_REPLAY_LATENCY_SCALE   multiply recorded latencies (default 1.0, 0 = no wait)
+    LLM_REPLAY_STRICT          "1" to fail on a key miss instead of falling
+                               back to another exchange of the same agent
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import IO, Any, BinaryIO, Dict, Iterator, List, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+DEFAULT_CASSETTE_PATH = "llm_cassette.jsonl.gz"
+
+
+class CassetteMissError(LookupError):
+    """Raised in strict replay when no recorded exchange matches a call."""
+
+
+def exchange_key(system_name: str, user_name: str, query: str | None, order_id: str | None) -> str:
+    canonical = json.dumps([system_name, user_name, query, order_id], ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def variables_hash(variables: Dict[str, Any]) -> str:
+    canonical = json.dumps(variables, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def _recording_order(exchange: Dict[str, Any]) -> tuple:
+    return exchange.get("recorded_at", 0.0), exchange.get("pid", 0), exchange.get("seq", 0)
+
+
+def _open(path: Path, mode: str) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")  # type: ignore[return-value]
+    return path.open(mode, encoding="utf-8")
+
+
+def read_exchanges(path: str | Path) -> Iterator[Dict[str, Any]]:
+    with _open(Path(path), "r") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+@dataclass
+class ReplayStats:
+    exact: int = 0
+    fallback: int = 0
+    misses: int = 0
+    # Exact key matches whose recorded prompt variables differ from the live ones.
+    prompt_changed: int = 0
+
+    def rates(self) -> Dict[str, float]:
+        calls = self.exact + self.fallback + self.misses
+        if not calls:
+            return {"fallback_rate": 0.0, "miss_rate": 0.0, "prompt_changed_rate": 0.0}
+        return {
+            "fallback_rate": round(self.fallback / calls, 3),
+            "miss_rate": round(self.misses / calls, 3),
+            "prompt_changed_rate": round(self.prompt_changed / calls, 3),
+        }
+
+
+class Cassette:
+    def __init__(self, path: str | Path, mode: str, latency_scale: float = 1.0, strict: bool = False):
+        if mode not in {"record", "replay"}:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.stats = ReplayStats()
+        self._lock = threading.Lock()
+        self._handle: BinaryIO | None = None
+        self._recorded: Dict[str, int] = {}
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_agent: Dict[str, List[Dict[str, Any]]] = {}
+        self._replayed: Dict[str, int] = {}
+        if mode == "replay":
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> None:
+        by_key: Dict[str, List[Dict[str, Any]]] = {}
+        by_agent: Dict[str, List[Dict[str, Any]]] = {}
+        for exchange in read_exchanges(self.path):
+            by_key.setdefault(exchange["key"], []).append(exchange)
+            by_agent.setdefault(exchange["system"], []).append(exchange)
+        # Repeated identical calls replay their recorded responses in order, then wrap.
+        self._by_key = {key: sorted(entries, key=_recording_order) for key, entries in by_key.items()}
+        self._by_agent = by_agent
+
+    def record(
+        self,
+        *,
+        key: str,
+        system_name: str,
+        user_name: str,
+        query: str | None,
+        variables: str | None,
+        messages: Sequence[BaseMessage],
+        response_text: str,
+        usage: Dict[str, Any] | None,
+        model: str | None,
+        latency_ms: float,
+    ) -> None:
+        with self._lock:
+            seq = self._recorded.get(key, 0)
+            self._recorded[key] = seq + 1
+        exchange = {
+            "key": key,
+            # seq counts per process; (pid, seq) is unique across workers sharing the file.
+            "pid": os.getpid(),
+            "seq": seq,
+            "system": system_name,
+            "user": user_name,
+            "query": query,
+            "variables": variables,
+            "prompt": [[message.type, str(message.content)] for message in messages],
+            "response": response_text,
+            "usage": usage or None,
+            "model": model,
+            "latency_ms": round(latency_ms, 1),
+            "recorded_at": time.time(),
+        }
+        data = (json.dumps(exchange, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        if self.path.suffix == ".gz":
+            data = gzip.compress(data)
+        with self._lock:
+            if self._handle is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._handle = self.path.open("ab", buffering=0)
+            self._handle.write(data)
+
+    def replay(self, key: str, system_name: str, variables: str | None = None) -> AIMessage:
+        with self._lock:
+            source = self._by_key.get(key)
+            counter = key
+            if source is not None:
+                self.stats.exact += 1
+            elif not self.strict and system_name in self._by_agent:
+                source = self._by_agent[system_name]
+                counter = f"agent:{system_name}"
+                self.stats.fallback += 1
+            else:
+                self.stats.misses += 1
+                raise CassetteMissError(f"No recorded exchange for {system_name} ({key})")
+            index = self._replayed.get(counter, 0)
+            self._replayed[counter] = index + 1
+            exchange = source[index % len(source)]
+            if counter == key and variables and exchange.get("variables") not in (None, variables):
+                self.stats.prompt_changed += 1
+        delay_ms = exchange.get("latency_ms", 0) * self.latency_scale
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        return AIMessage(
+            content=exchange["response"],
+            usage_metadata=exchange.get("usage") or None,
+            response_metadata={"model_name": exchange.get("model"), "replayed": True},
+        )
+
+    def report(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "path": str(self.path), **asdict(self.stats), **self.stats.rates()}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
+_ACTIVE: Cassette | None = None
+_CONFIGURED = False
+_ACTIVE_LOCK = threading.Lock()
+
+
+def use_cassette(cassette: Cassette | None) -> None:
+    """Install ``cassette`` process-wide (``None`` disables record/replay)."""
+
+    global _ACTIVE, _CONFIGURED
+    with _ACTIVE_LOCK:
+        if _ACTIVE is not None and _ACTIVE is not cassette:
+            _ACTIVE.close()
+        _ACTIVE = cassette
+        _CONFIGURED = True
+
+
+def get_cassette() -> Cassette | None:
+    """Return the active cassette, configuring it from the environment on first use."""
+
+    global _ACTIVE, _CONFIGURED
+    if _CONFIGURED:
+        return _ACTIVE
+    with _ACTIVE_LOCK:
+        if not _CONFIGURED:
+            mode = os.getenv("LLM_CASSETTE_MODE", "").strip().lower()
+            if mode:
+                _ACTIVE = Cassette(
+                    os.getenv("LLM_CASSETTE_PATH") or DEFAULT_CASSETTE_PATH,
+                    mode,
+                    latency_scale=float(os.getenv("LLM_REPLAY_LATENCY_SCALE", "1.0")),
+                    strict=os.getenv("LLM_REPLAY_STRICT") == "1",
+                )
+            _CONFIGURED = True
+    return _ACTIVE
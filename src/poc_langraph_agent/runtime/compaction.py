@@ -0,0 +1,157 @@
+"""Compact prompt payloads: per-agent field projection, minified JSON and token budgets."""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Tuple
+
+# A projection maps a field name to ``None`` (keep as-is) or to a nested
+# projection applied to the value (or to each element when it is a list).
+Projection = Mapping[str, Any]
+
+_ORDER_ITEM_FIELDS: Projection = {"sku": None, "name": None, "qty": None, "price": None}
+_ORDER_RECORD_FIELDS: Projection = {
+    "status": None,
+    "placed_at": None,
+    "items": _ORDER_ITEM_FIELDS,
+    "total": None,
+    "currency": None,
+    "notes": None,
+}
+_ORDER_CANDIDATE_FIELDS: Projection = {
+    "order_id": None,
+    "status": None,
+    "placed_at": None,
+    "items": {"name": None, "qty": None},
+    "total": None,
+}
+_REFUND_RECORD_FIELDS: Projection = {"action": None, "notes": None, "updated_at": None}
+_ORDER_RESULT_FIELDS: Projection = {"order_status": None, "refund_eligible": None, "notes": None}
+_REFUND_RESULT_FIELDS: Projection = {"refund_action": None, "refund_id": None, "notes": None}
+
+AGENT_FIELDS: Dict[str, Dict[str, Projection]] = {
+    "order_agent": {
+        "order_record": _ORDER_RECORD_FIELDS,
+        "order_candidates": _ORDER_CANDIDATE_FIELDS,
+        "refund_record": _REFUND_RECORD_FIELDS,
+    },
+    "refund_agent": {
+        "order_agent_result": _ORDER_RESULT_FIELDS,
+        "order_record": _ORDER_RECORD_FIELDS,
+        "refund_record": _REFUND_RECORD_FIELDS,
+    },
+    "response_agent": {
+        "order_agent_result": _ORDER_RESULT_FIELDS,
+        "refund_agent_result": _REFUND_RESULT_FIELDS,
+    },
+}
+
+
+@dataclass(frozen=True)
+class PromptBudget:
+    """Token budget for the structured variables of one agent prompt."""
+
+    max_tokens: int
+    max_list_items: int = 8
+    max_text_chars: int = 240
+
+
+AGENT_BUDGETS: Dict[str, PromptBudget] = {
+    "order_agent": PromptBudget(max_tokens=600),
+    "refund_agent": PromptBudget(max_tokens=700),
+    "response_agent": PromptBudget(max_tokens=400),
+}
+
+_MIN_LIST_ITEMS = 1
+_MIN_TEXT_CHARS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate.
+
+    UTF-8 byte length / 3 lands close to Gemini's counts for this workload:
+    ASCII JSON runs about 3-4 characters per token, Hangul (3 bytes each)
+    about one token per syllable.
+    """
+
+    return (len(text.encode("utf-8")) + 2) // 3
+
+
+def minify_json(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def project(data: Any, fields: Projection | None) -> Any:
+    """Keep only ``fields`` of ``data``, recursing into nested projections."""
+
+    if fields is None:
+        return data
+    if isinstance(data, list):
+        return [project(entry, fields) for entry in data]
+    if not isinstance(data, dict):
+        return data
+    projected: Dict[str, Any] = {}
+    for key, nested in fields.items():
+        if key in data:
+            projected[key] = project(data[key], nested)
+    return projected
+
+
+def truncate(data: Any, max_list_items: int, max_text_chars: int) -> Any:
+    """Clip long lists and strings, leaving a marker with the dropped count."""
+
+    if isinstance(data, str):
+        if len(data) <= max_text_chars:
+            return data
+        return data[:max_text_chars] + "…"
+    if isinstance(data, list):
+        kept = [truncate(entry, max_list_items, max_text_chars) for entry in data[:max_list_items]]
+        if len(data) > max_list_items:
+            kept.append(f"…+{len(data) - max_list_items}")
+        return kept
+    if isinstance(data, dict):
+        return {key: truncate(value, max_list_items, max_text_chars) for key, value in data.items()}
+    return data
+
+
+def _render(value: Any) -> str:
+    if not value:
+        return "[]" if isinstance(value, list) else "{}"
+    return minify_json(value)
+
+
+def compact_variables(agent: str, data: Mapping[str, Any]) -> Tuple[Dict[str, str], Dict[str, int]]:
+    """Render structured prompt inputs for ``agent`` within its token budget.
+
+    Fields irrelevant to the agent are dropped first; if the minified result
+    still exceeds the budget, list and text limits are halved until it fits or
+    reaches the floor. Returns the rendered variables and size statistics.
+    """
+
+    fields = AGENT_FIELDS.get(agent, {})
+    budget = AGENT_BUDGETS.get(agent)
+    projected = {name: project(value, fields.get(name)) for name, value in data.items()}
+    raw_tokens = sum(estimate_tokens(_render(value)) for value in projected.values())
+
+    max_items = budget.max_list_items if budget else None
+    max_chars = budget.max_text_chars if budget else None
+    while True:
+        if max_items is None:
+            rendered = {name: _render(value) for name, value in projected.items()}
+        else:
+            rendered = {
+                name: _render(truncate(value, max_items, max_chars))
+                for name, value in projected.items()
+            }
+        tokens = sum(estimate_tokens(text) for text in rendered.values())
+        if (
+            budget is None
+            or tokens <= budget.max_tokens
+            or (max_items <= _MIN_LIST_ITEMS and max_chars <= _MIN_TEXT_CHARS)
+        ):
+            break
+        max_items = max(_MIN_LIST_ITEMS, max_items // 2)
+        max_chars = max(_MIN_TEXT_CHARS, max_chars // 2)
+
+    stats = {"variables_tokens_est": tokens, "variables_tokens_projected": raw_tokens}
+    return rendered, stats
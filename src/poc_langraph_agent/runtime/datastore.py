@@ -1,76 +1,232 @@
-"""Simple JSON-based datastore for orders and refunds."""
+"""JSON datastore for orders and refunds, optionally sharded by order ID.
+
+With ``DATASTORE_SHARDS=1`` (the default) records live in ``orders.json`` and
+``refunds.json``. With N > 1 each file becomes ``<name>.shards/NNN-of-NNN.json``
+partitioned by CRC32 of the order ID; the shard set is seeded from the
+unsharded file the first time it is used. From then on the shards are the
+only up-to-date copy, so changing ``DATASTORE_SHARDS`` (including back to 1)
+while another shard layout exists raises ``ShardLayoutError`` instead of
+serving stale or partial data.
+
+Every write holds an exclusive ``fcntl`` lock on the shard's ``.lock`` file
+for the whole read-modify-write and replaces the shard via write-to-temp +
+``os.replace``, so concurrent writers in different processes do not lose
+updates and readers never see a partially written file. Readers therefore
+need no lock.
+"""
 from __future__ import annotations
 
+import bisect
 import json
+import os
+import re
+import tempfile
+import threading
 import uuid
-from datetime import datetime
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms fall back to in-process locking
+    fcntl = None  # type: ignore[assignment]
+
+from .profiling import stage
 
 ROOT = Path(__file__).resolve().parents[2]
-ORDERS_PATH = ROOT / "assets" / "orders.json"
-REFUNDS_PATH = ROOT / "assets" / "refunds.json"
+ASSETS_DIR = Path(os.getenv("POC_ASSETS_DIR") or ROOT / "assets")
+ORDERS_PATH = ASSETS_DIR / "orders.json"
+REFUNDS_PATH = ASSETS_DIR / "refunds.json"
+SHARD_COUNT = max(1, int(os.getenv("DATASTORE_SHARDS", "1")))
+
+_TOKEN_PATTERN = re.compile(r"[\w-]+")
+_MIN_TOKEN_LENGTH = 2
+_THREAD_LOCK = threading.Lock()
+
 
+class ShardLayoutError(RuntimeError):
+    """Raised when ``DATASTORE_SHARDS`` does not match the shard layout on disk."""
 
-def _load_json(path: Path) -> Dict[str, Any]:
+
+def _load_json(path: Path) -> Any:
     if not path.exists():
         return {}
-    with path.open("r", encoding="utf-8") as handle:
+    with stage("datastore"), path.open("r", encoding="utf-8") as handle:
         return json.load(handle)
 
 
-def _write_json(path: Path, data: Dict[str, Any]) -> None:
+def _write_json(path: Path, data: Any) -> None:
+    """Atomically replace ``path``: readers see either the old or the new file."""
+
+    with stage("datastore"):
+        _replace_json(path, data)
+
+
+def _replace_json(path: Path, data: Any) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as handle:
-        json.dump(data, handle, ensure_ascii=False, indent=2)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, ensure_ascii=False, indent=2)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
 
 
-def load_orders() -> Dict[str, Any]:
-    data = _load_json(ORDERS_PATH)
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Exclusive advisory lock guarding a read-modify-write of ``path``."""
+
+    lock_path = path.with_name(path.name + ".lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        with _THREAD_LOCK:
+            yield
+        return
+    with lock_path.open("a") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _records_by_id(data: Any) -> Dict[str, Any]:
     if isinstance(data, list):
-        orders: Dict[str, Any] = {}
+        records: Dict[str, Any] = {}
         for entry in data:
             order_id = entry.get("order_id")
             if not order_id:
                 continue
-            record = {key: value for key, value in entry.items() if key != "order_id"}
-            orders[order_id] = record
-        return orders
+            records[order_id] = {key: value for key, value in entry.items() if key != "order_id"}
+        return records
     if isinstance(data, dict):
         return data
     return {}
 
 
+def _records_list(records: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"order_id": oid, **record} for oid, record in records.items()]
+
+
+def shard_index(order_id: str, shard_count: int | None = None) -> int:
+    count = shard_count or SHARD_COUNT
+    # CRC32 rather than hash(): it must agree across processes and restarts.
+    return zlib.crc32(order_id.encode("utf-8")) % count
+
+
+def _shard_dir(base: Path) -> Path:
+    return base.with_name(base.stem + ".shards")
+
+
+def _shard_path(base: Path, index: int) -> Path:
+    if SHARD_COUNT == 1:
+        return base
+    return _shard_dir(base) / f"{index:03d}-of-{SHARD_COUNT:03d}.json"
+
+
+def shard_paths(base: Path) -> List[Path]:
+    _ensure_shards(base)
+    return [_shard_path(base, index) for index in range(SHARD_COUNT)]
+
+
+_SEEDED: Set[Tuple[Path, int]] = set()
+
+
+def _shard_layouts(base: Path) -> Set[int]:
+    """Shard counts that have files in ``base``'s shard directory."""
+
+    return {
+        int(path.stem.rsplit("-of-", 1)[1])
+        for path in _shard_dir(base).glob("[0-9][0-9][0-9]-of-[0-9][0-9][0-9].json")
+    }
+
+
+def _ensure_shards(base: Path) -> None:
+    """Create the shard set for ``base`` on first use, seeded from the unsharded file."""
+
+    if (base, SHARD_COUNT) in _SEEDED:
+        return
+    other_layouts = _shard_layouts(base) - {SHARD_COUNT}
+    if other_layouts:
+        # The base file stopped receiving writes when the data was sharded; merging
+        # or ignoring the other layout would both lose records.
+        raise ShardLayoutError(
+            f"{_shard_dir(base)} holds data for DATASTORE_SHARDS={max(other_layouts)}, "
+            f"not {SHARD_COUNT}; migrate it before changing the shard count"
+        )
+    if SHARD_COUNT == 1:
+        _SEEDED.add((base, SHARD_COUNT))
+        return
+    paths = [_shard_path(base, index) for index in range(SHARD_COUNT)]
+    if not all(path.exists() for path in paths):
+        with _locked(_shard_dir(base) / "layout"):
+            if not all(path.exists() for path in paths):
+                records = _records_by_id(_load_json(base))
+                shards: List[Dict[str, Any]] = [{} for _ in paths]
+                for order_id, record in records.items():
+                    shards[shard_index(order_id)][order_id] = record
+                for path, shard in zip(paths, shards):
+                    if not path.exists():
+                        _write_json(path, _records_list(shard))
+    _SEEDED.add((base, SHARD_COUNT))
+
+
+def _load_all(base: Path) -> Dict[str, Any]:
+    records: Dict[str, Any] = {}
+    for path in shard_paths(base):
+        records.update(_records_by_id(_load_json(path)))
+    return records
+
+
+def _load_one(base: Path, order_id: str) -> Dict[str, Any] | None:
+    _ensure_shards(base)
+    return _records_by_id(_load_json(_shard_path(base, shard_index(order_id)))).get(order_id)
+
+
+def _upsert(base: Path, order_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    _ensure_shards(base)
+    path = _shard_path(base, shard_index(order_id))
+    with _locked(path):
+        records = _records_by_id(_load_json(path))
+        records[order_id] = record
+        _write_json(path, _records_list(records))
+    return record
+
+
+def load_orders() -> Dict[str, Any]:
+    return _load_all(ORDERS_PATH)
+
+
 def get_order(order_id: str) -> Dict[str, Any] | None:
-    orders = load_orders()
-    return orders.get(order_id)
+    return _load_one(ORDERS_PATH, order_id)
 
 
 def load_refunds() -> Dict[str, Any]:
-    data = _load_json(REFUNDS_PATH)
-    if isinstance(data, list):
-        refunds: Dict[str, Any] = {}
-        for entry in data:
-            order_id = entry.get("order_id")
-            if not order_id:
-                continue
-            refunds[order_id] = {key: value for key, value in entry.items() if key != "order_id"}
-        return refunds
-    if isinstance(data, dict):
-        return data
-    return {}
+    return _load_all(REFUNDS_PATH)
+
+
+def get_refund(order_id: str) -> Dict[str, Any] | None:
+    return _load_one(REFUNDS_PATH, order_id)
 
 
 def record_refund(order_id: str, action: str, notes: list[str]) -> Dict[str, Any]:
-    refunds = load_refunds()
-    refunds[order_id] = {
+    record = {
         "action": action,
         "notes": notes,
         "updated_at": datetime.utcnow().isoformat() + "Z",
     }
-    refund_list = [{"order_id": oid, **record} for oid, record in refunds.items()]
-    _write_json(REFUNDS_PATH, refund_list)
-    return refunds[order_id]
+    return _upsert(REFUNDS_PATH, order_id, record)
 
 
 def generate_order_id(existing: Dict[str, Any] | None = None) -> str:
@@ -88,8 +244,194 @@ def generate_order_id(existing: Dict[str, Any] | None = None) -> str:
 
 
 def record_order(order_id: str, order_data: Dict[str, Any]) -> Dict[str, Any]:
-    orders = load_orders()
-    orders[order_id] = order_data
-    order_list = [{"order_id": oid, **record} for oid, record in orders.items()]
-    _write_json(ORDERS_PATH, order_list)
-    return orders[order_id]
+    _upsert(ORDERS_PATH, order_id, order_data)
+    invalidate_order_index()
+    return order_data
+
+
+def _normalize_token(token: str) -> str:
+    return token.strip().lower()
+
+
+def _item_tokens(item: Dict[str, Any]) -> Set[str]:
+    """Index keys for an order item: SKU, name words and the space-less name."""
+
+    tokens: Set[str] = set()
+    sku = item.get("sku")
+    if sku:
+        tokens.add(_normalize_token(str(sku)))
+    name = str(item.get("name") or "")
+    words = [_normalize_token(word) for word in _TOKEN_PATTERN.findall(name)]
+    tokens.update(word for word in words if len(word) >= _MIN_TOKEN_LENGTH)
+    compact = "".join(words)
+    if len(compact) >= _MIN_TOKEN_LENGTH:
+        tokens.add(compact)
+    return tokens
+
+
+def _parse_placed_at(value: Any) -> date | None:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def time_hint_range(time_hint: str, reference: date | None = None) -> Tuple[date, date] | None:
+    """Translate an intent ``time_hint`` slot into an inclusive calendar date range."""
+
+    today = reference or date.today()
+    if time_hint == "today":
+        return today, today
+    if time_hint == "yesterday":
+        day = today - timedelta(days=1)
+        return day, day
+    if time_hint == "last_week":
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=6)
+    if time_hint == "last_month":
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end
+    return None
+
+
+@dataclass
+class OrderIndex:
+    """Secondary indexes over customer email, item tokens and order date."""
+
+    orders: Dict[str, Any]
+    by_email: Dict[str, Set[str]] = field(default_factory=dict)
+    by_item_token: Dict[str, Set[str]] = field(default_factory=dict)
+    by_date: List[Tuple[str, str]] = field(default_factory=list)
+    max_token_length: int = 0
+
+    @classmethod
+    def build(cls, orders: Dict[str, Any]) -> "OrderIndex":
+        index = cls(orders=orders)
+        for order_id, record in orders.items():
+            email = _normalize_token(str((record.get("customer") or {}).get("email") or ""))
+            if email:
+                index.by_email.setdefault(email, set()).add(order_id)
+            for item in record.get("items") or []:
+                for token in _item_tokens(item):
+                    index.by_item_token.setdefault(token, set()).add(order_id)
+                    index.max_token_length = max(index.max_token_length, len(token))
+            placed = _parse_placed_at(record.get("placed_at"))
+            if placed:
+                index.by_date.append((placed.isoformat(), order_id))
+        index.by_date.sort()
+        return index
+
+    def match_customer(self, customer: str) -> Set[str]:
+        return set(self.by_email.get(_normalize_token(customer), ()))
+
+    def match_items(self, item_query: str) -> Set[str]:
+        """Return orders whose item keys prefix any query token.
+
+        Prefix matching lets "커피머신을" hit the "커피머신" key without scanning
+        the whole token table; each query token costs at most one lookup per
+        character.
+        """
+
+        matched: Set[str] = set()
+        for raw in _TOKEN_PATTERN.findall(item_query):
+            token = _normalize_token(raw)
+            longest = min(len(token), self.max_token_length)
+            for end in range(_MIN_TOKEN_LENGTH, longest + 1):
+                hits = self.by_item_token.get(token[:end])
+                if hits:
+                    matched.update(hits)
+        return matched
+
+    def match_dates(self, start: date, end: date) -> Set[str]:
+        low = bisect.bisect_left(self.by_date, (start.isoformat(), ""))
+        high = bisect.bisect_right(self.by_date, (end.isoformat(), "\uffff"))
+        return {order_id for _, order_id in self.by_date[low:high]}
+
+    def sort_recent(self, order_ids: Iterable[str]) -> List[str]:
+        return sorted(
+            order_ids,
+            key=lambda oid: (str(self.orders[oid].get("placed_at") or ""), oid),
+            reverse=True,
+        )
+
+
+_ORDER_INDEX: OrderIndex | None = None
+_ORDER_INDEX_STAMP: Tuple[Any, ...] | None = None
+_ORDER_INDEX_LOCK = threading.Lock()
+
+
+def _files_stamp(paths: Iterable[Path]) -> Tuple[Any, ...]:
+    # Inode is included because os.replace swaps in a new file on every write.
+    stamps = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stamps.append(None)
+            continue
+        stamps.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def get_order_index() -> OrderIndex:
+    """Return the cached order index, rebuilding it when any order shard changes."""
+
+    global _ORDER_INDEX, _ORDER_INDEX_STAMP
+    stamp = _files_stamp(shard_paths(ORDERS_PATH))
+    with _ORDER_INDEX_LOCK:
+        if _ORDER_INDEX is None or stamp != _ORDER_INDEX_STAMP:
+            _ORDER_INDEX = OrderIndex.build(load_orders())
+            _ORDER_INDEX_STAMP = stamp
+        return _ORDER_INDEX
+
+
+def invalidate_order_index() -> None:
+    global _ORDER_INDEX, _ORDER_INDEX_STAMP
+    with _ORDER_INDEX_LOCK:
+        _ORDER_INDEX = None
+        _ORDER_INDEX_STAMP = None
+
+
+def find_orders(
+    customer: str | None = None,
+    item_query: str | None = None,
+    time_hint: str | None = None,
+    *,
+    reference: date | None = None,
+    limit: int = 5,
+) -> List[Dict[str, Any]]:
+    """Resolve candidate orders when the customer did not give an order ID.
+
+    Customer and item criteria are intersected; item tokens that match no
+    known item are ignored rather than emptying the result. ``time_hint`` narrows the
+    result to its calendar window; when that window empties a non-empty
+    customer/item match, the match is kept and ordered by recency instead so
+    a stale hint does not hide the only plausible order. Returns at most
+    ``limit`` records (newest first) with ``order_id`` inlined.
+    """
+
+    index = get_order_index()
+    candidates: Set[str] | None = None
+    if customer:
+        candidates = index.match_customer(customer)
+    items = index.match_items(item_query) if item_query else set()
+    # A query naming no known item ("지난달 주문한 거") is no item criterion.
+    if items:
+        candidates = items if candidates is None else candidates & items
+
+    window = time_hint_range(time_hint, reference) if time_hint else None
+    if window is not None:
+        in_window = index.match_dates(*window)
+        if candidates is None:
+            candidates = in_window
+        elif candidates & in_window:
+            candidates &= in_window
+
+    if not candidates:
+        return []
+    return [
+        {"order_id": order_id, **index.orders[order_id]}
+        for order_id in index.sort_recent(candidates)[:limit]
+    ]
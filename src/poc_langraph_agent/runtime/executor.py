@@ -1,53 +1,158 @@
-"""Sequential executor with retries and backoff."""
+"""Sequential executor with retries, backoff and deadline propagation."""
 from __future__ import annotations
 
 import concurrent.futures
+import copy
 import time
 from typing import Any, Dict
 
-from ..schemas import Plan
-from ..tools.nodes import AgentExecutionError, get_node
+from ..schemas import Plan, PlannerNode
+from ..tools.nodes import AgentExecutionError, DeadlineExceededError, get_node
+from .attempt import AttemptGuard
+from .latency import LATENCY_TRACKER, LatencyTracker
+from .profiling import propagate, stage
 from .safety import jitter_backoff
 
+# Smallest budget worth starting an attempt with.
+MIN_ATTEMPT_MS = 50
+
+
+def _attempt_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of ``payload`` for one attempt, so an abandoned attempt that keeps
+    running cannot change what the retry sees.
+
+    Handlers replace top-level keys and append to ``trace``/``usage``; those
+    two are copied, everything else is shared read-only.
+    """
+
+    attempt = dict(payload)
+    attempt["trace"] = list(payload.get("trace", []))
+    if "usage" in payload:
+        attempt["usage"] = copy.deepcopy(payload["usage"])
+    return attempt
+
 
 class Executor:
-    def __init__(self, base_delay: float = 0.25):
+    def __init__(self, base_delay: float = 0.25, tracker: LatencyTracker = LATENCY_TRACKER):
         self.base_delay = base_delay
+        self.tracker = tracker
 
-    def _run_call(self, node_id: str, payload: Dict[str, Any], timeout_ms: int) -> Dict[str, Any]:
-        node_spec = get_node(node_id)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
-            future = pool.submit(node_spec.handler, payload)
+    def _run_call(
+        self, node: PlannerNode, payload: Dict[str, Any], timeout_ms: int, deadline: float | None = None
+    ) -> Dict[str, Any]:
+        node_spec = get_node(node.agent)
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        started = time.monotonic()
+        ok = False
+        # A timeout caused by the caller's deadline says nothing about the agent.
+        record = True
+        guard = AttemptGuard()
+        attempt = _attempt_payload(payload)
+        future = pool.submit(propagate(guard.run), node_spec.handler, attempt)
+        try:
             try:
-                return future.result(timeout=timeout_ms / 1000)
+                result = future.result(timeout=timeout_ms / 1000)
             except concurrent.futures.TimeoutError as exc:
-                future.cancel()
-                raise AgentExecutionError(f"Node {node_id} timed out") from exc
+                if guard.abandon():
+                    future.cancel()
+                    record = timeout_ms >= node.timeout_ms
+                    raise AgentExecutionError(f"Node {node.agent} timed out") from exc
+                # The attempt already wrote to the datastore; let it finish if the deadline allows.
+                if deadline is None:
+                    remaining = node.timeout_ms / 1000
+                else:
+                    remaining = max(0.0, deadline - time.monotonic())
+                try:
+                    result = future.result(timeout=remaining)
+                except concurrent.futures.TimeoutError:
+                    if deadline is None:
+                        raise AgentExecutionError(f"Node {node.agent} timed out after writing") from exc
+                    record = False
+                    raise DeadlineExceededError(
+                        f"Deadline exceeded while {node.agent} finished its write"
+                    ) from exc
+            ok = True
+            return result
+        except AgentExecutionError:
+            # Keep the tokens a finished attempt spent for the retry and the ledger
+            # (a timed-out one is still running and may still change them).
+            if future.done() and "usage" in attempt:
+                payload["usage"] = attempt["usage"]
+            raise
+        finally:
+            if record:
+                self.tracker.observe(node.agent, (time.monotonic() - started) * 1000, ok)
+            # Don't block on a timed-out handler; it finishes in the background.
+            pool.shutdown(wait=False)
+
+    def _expected_ms(self, agent: str) -> float:
+        summary = self.tracker.summary(agent)
+        return summary.p50_ms if summary else 0.0
+
+    def _node_budget_ms(self, plan: Plan, position: int, node: PlannerNode, deadline: float | None) -> int:
+        """Timeout for the next attempt of ``node``: its own limit, capped by the deadline.
+
+        The typical (p50) latency of the nodes still to run is held back so an
+        early node cannot spend the whole budget, unless that would leave this
+        node less than ``MIN_ATTEMPT_MS``.
+        """
+
+        if deadline is None:
+            return node.timeout_ms
+        remaining_ms = (deadline - time.monotonic()) * 1000
+        if remaining_ms < MIN_ATTEMPT_MS:
+            raise DeadlineExceededError(f"Deadline exceeded before {node.agent}")
+        reserve_ms = sum(self._expected_ms(later.agent) for later in plan.nodes[position + 1 :])
+        budget_ms = remaining_ms - reserve_ms
+        if budget_ms < MIN_ATTEMPT_MS:
+            budget_ms = remaining_ms
+        return int(min(node.timeout_ms, budget_ms))
+
+    def execute(
+        self, plan: Plan, initial_payload: Dict[str, Any], deadline: float | None = None
+    ) -> Dict[str, Any]:
+        """Run ``plan`` in order; ``deadline`` is an absolute ``time.monotonic()`` value."""
 
-    def execute(self, plan: Plan, initial_payload: Dict[str, Any]) -> Dict[str, Any]:
         payload = dict(initial_payload)
-        transcript = payload.setdefault("trace", [])
-        for node in plan.nodes:
-            attempts = 0
-            last_error: Exception | None = None
-            while attempts <= node.max_retries:
-                try:
-                    transcript.append({"node": node.agent, "attempt": attempts + 1})
-                    payload = self._run_call(node.agent, payload, node.timeout_ms)
-                    break
-                except AgentExecutionError as exc:
-                    last_error = exc
-                    attempts += 1
-                    if attempts > node.max_retries:
-                        raise
-                    delay = jitter_backoff(self.base_delay, attempts)
-                    transcript.append(
-                        {
-                            "node": node.agent,
-                            "error": str(exc),
-                            "retry_in": round(delay, 3),
-                            "attempt": attempts,
-                        }
-                    )
-                    time.sleep(delay)
+        payload.setdefault("trace", [])
+        try:
+            for position, node in enumerate(plan.nodes):
+                attempts = 0
+                last_error: Exception | None = None
+                while attempts <= node.max_retries:
+                    budget_ms = self._node_budget_ms(plan, position, node, deadline)
+                    try:
+                        payload["trace"].append(
+                            {"node": node.agent, "attempt": attempts + 1, "budget_ms": budget_ms}
+                        )
+                        with stage(node.agent):
+                            payload = self._run_call(node, payload, budget_ms, deadline)
+                        break
+                    except AgentExecutionError as exc:
+                        last_error = exc
+                        attempts += 1
+                        if attempts > node.max_retries:
+                            raise
+                        delay = jitter_backoff(self.base_delay, attempts)
+                        if deadline is not None:
+                            remaining_ms = (deadline - time.monotonic()) * 1000
+                            needed_ms = delay * 1000 + max(MIN_ATTEMPT_MS, self._expected_ms(node.agent))
+                            if needed_ms > remaining_ms:
+                                raise DeadlineExceededError(
+                                    f"Retry of {node.agent} cannot finish before the deadline"
+                                ) from exc
+                        payload["trace"].append(
+                            {
+                                "node": node.agent,
+                                "error": str(exc),
+                                "retry_in": round(delay, 3),
+                                "attempt": attempts,
+                            }
+                        )
+                        with stage("backoff"):
+                            time.sleep(delay)
+        except AgentExecutionError as exc:
+            # Failed requests still spent tokens; let the caller account them.
+            exc.usage = payload.get("usage")
+            raise
         return payload
@@ -0,0 +1,81 @@
+"""Offline stand-in for Gemini used by benchmarks and load tests.
+
+Enabled with ``LLM_BACKEND=fake``. Replies are canned per agent (detected from
+the JSON schema example in each user prompt) and latency is simulated as a
+fixed base plus a per-token cost, so prompt size still shows up in timings.
+"""
+from __future__ import annotations
+
+import os
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from .compaction import estimate_tokens
+
+_ORDER_SCHEMA_MARKER = '"order_status": "string"'
+_REFUND_SCHEMA_MARKER = '"refund_id": "REF-123"'
+_ORDER_ID_PATTERN = re.compile(r"ORD-[A-Za-z0-9]+")
+
+
+class FakeGeminiChat(BaseChatModel):
+    """Deterministic chat model that answers the three agent prompts."""
+
+    model: str = "fake"
+    base_latency_ms: float = 0.0
+    ms_per_1k_tokens: float = 0.0
+
+    @classmethod
+    def from_env(cls, model: str) -> "FakeGeminiChat":
+        return cls(
+            model=model,
+            base_latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")),
+            ms_per_1k_tokens=float(os.getenv("FAKE_LLM_MS_PER_1K_TOKENS", "0")),
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def _reply(self, prompt: str) -> str:
+        if _ORDER_SCHEMA_MARKER in prompt:
+            if "주문 데이터(JSON):\n{}" in prompt:
+                return '{"order_status": "not_found", "refund_eligible": false, "notes": ["주문 데이터를 찾을 수 없습니다."]}'
+            return '{"order_status": "배송 완료", "refund_eligible": true, "notes": ["배송 완료 후 7일 이내"]}'
+        if _REFUND_SCHEMA_MARKER in prompt:
+            match = _ORDER_ID_PATTERN.search(prompt)
+            suffix = match.group(0)[4:] if match else "0000"
+            return (
+                '{"refund_action": "approve", "refund_id": "REF-%s", '
+                '"notes": ["환불이 승인되었습니다.", "영업일 기준 3-5일 이내 처리"]}' % suffix
+            )
+        return "고객님, 요청하신 내용을 확인했습니다. 처리 결과를 안내해 드립니다."
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        reply = self._reply(prompt)
+        input_tokens = estimate_tokens(prompt)
+        output_tokens = estimate_tokens(reply)
+        delay_ms = self.base_latency_ms + self.ms_per_1k_tokens * input_tokens / 1000
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        message = AIMessage(
+            content=reply,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            response_metadata={"model_name": self.model},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
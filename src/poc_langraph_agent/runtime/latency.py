@@ -0,0 +1,83 @@
+"""Rolling per-agent latency statistics used to size timeouts and retries."""
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Tuple
+
+# Log-spaced bucket upper bounds (ms) for reporting.
+_BUCKETS_MS: Tuple[float, ...] = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, math.inf)
+
+
+@dataclass(frozen=True)
+class LatencySummary:
+    samples: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    failure_rate: float
+
+
+class LatencyTracker:
+    """Keeps the last ``window`` call durations per agent, thread-safe.
+
+    Failed calls (errors and timeouts) are recorded with the time they
+    consumed, so a timing-out agent pushes its own quantiles up instead of
+    disappearing from the statistics.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[Tuple[float, bool]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, agent: str, elapsed_ms: float, ok: bool = True) -> None:
+        with self._lock:
+            samples = self._samples.setdefault(agent, deque(maxlen=self.window))
+            samples.append((elapsed_ms, ok))
+
+    def summary(self, agent: str) -> LatencySummary | None:
+        with self._lock:
+            samples = list(self._samples.get(agent, ()))
+        if not samples:
+            return None
+        ordered = sorted(elapsed for elapsed, _ in samples)
+        failures = sum(1 for _, ok in samples if not ok)
+
+        def _quantile(q: float) -> float:
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+        return LatencySummary(
+            samples=len(ordered),
+            p50_ms=_quantile(0.5),
+            p95_ms=_quantile(0.95),
+            p99_ms=_quantile(0.99),
+            failure_rate=failures / len(samples),
+        )
+
+    def histogram(self, agent: str) -> List[Tuple[float, int]]:
+        """Return ``(bucket_upper_bound_ms, count)`` pairs for the current window."""
+
+        with self._lock:
+            samples = list(self._samples.get(agent, ()))
+        counts = [0] * len(_BUCKETS_MS)
+        for elapsed, _ in samples:
+            for index, bound in enumerate(_BUCKETS_MS):
+                if elapsed <= bound:
+                    counts[index] += 1
+                    break
+        return list(zip(_BUCKETS_MS, counts))
+
+    def snapshot(self) -> Dict[str, LatencySummary]:
+        with self._lock:
+            agents = list(self._samples)
+        return {agent: summary for agent in agents if (summary := self.summary(agent))}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+LATENCY_TRACKER = LatencyTracker()
@@ -6,6 +6,7 @@ from functools import lru_cache
 from pathlib import Path
 
 from dotenv import find_dotenv, load_dotenv
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 DEFAULT_MODEL = "gemini-2.5-flash"
@@ -22,20 +23,30 @@ class MissingAPIKeyError(RuntimeError):
     """Raised when Google Generative AI API key is not configured."""
 
 
-@lru_cache(maxsize=1)
-def get_gemini(model: str | None = None) -> ChatGoogleGenerativeAI:
+def normalize_model_name(model: str) -> str:
+    """Return ``model`` in the canonical format expected by the Google GenAI SDK."""
+    # Use Makersuite-style names (no "models/" prefix) to avoid v1beta 404s
+    if model.startswith("models/"):
+        model = model[len("models/") :]
+    # Strip unsupported alias suffixes (e.g., "-latest")
+    if model.endswith("-latest"):
+        model = model[: -len("-latest")]
+    return model
+
+
+@lru_cache(maxsize=8)
+def get_gemini(model: str | None = None, temperature: float = 0.1) -> BaseChatModel:
+    """Return a chat client for ``model``; one cached client per (model, temperature)."""
+    if os.getenv("LLM_BACKEND", "").lower() == "fake":
+        from .fake_llm import FakeGeminiChat
+
+        return FakeGeminiChat.from_env(model or os.getenv("GEMINI_MODEL") or DEFAULT_MODEL)
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise MissingAPIKeyError("GOOGLE_API_KEY not set. Update your .env file.")
-    # Normalize model name to the canonical format expected by the Google GenAI SDK
-    configured = model or os.getenv("GEMINI_MODEL") or DEFAULT_MODEL
-    # Strip unsupported alias suffixes (e.g., "-latest")
-    if configured.endswith("-latest"):
-        configured = configured[: -len("-latest")]
-    # Use Makersuite-style names (no "models/" prefix) to avoid v1beta 404s
-    model_name = configured
+    model_name = normalize_model_name(model or os.getenv("GEMINI_MODEL") or DEFAULT_MODEL)
     return ChatGoogleGenerativeAI(
         model=model_name,
         google_api_key=api_key,
-        temperature=0.1
+        temperature=temperature,
     )
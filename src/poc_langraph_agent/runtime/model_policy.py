@@ -0,0 +1,100 @@
+"""Model-tier policy: pick a Gemini model per agent and route cost estimate.
+
+The default policy sends response phrasing and low-cost routes to the fast
+tier and refund decisions to the strong tier. Override it with
+``MODEL_POLICY`` set to a JSON object or to the path of a JSON file, e.g.::
+
+    {"tiers": {"strong": "gemini-2.5-flash"}, "agents": {"order_agent": "fast"}}
+
+Keys given in the override are merged over the defaults.
+"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from .llm import DEFAULT_MODEL, normalize_model_name
+
+# USD per 1M (input, output) tokens; used for cost estimates only.
+_DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+
+def _default_tiers() -> Dict[str, str]:
+    return {
+        "fast": "gemini-2.5-flash-lite",
+        "standard": os.getenv("GEMINI_MODEL") or DEFAULT_MODEL,
+        "strong": "gemini-2.5-pro",
+    }
+
+
+@dataclass
+class ModelPolicy:
+    tiers: Dict[str, str] = field(default_factory=_default_tiers)
+    # Fixed tier per agent (agent id without the ".vN" suffix).
+    agents: Dict[str, str] = field(
+        default_factory=lambda: {"response_agent": "fast", "refund_agent": "strong"}
+    )
+    # Tier for agents without a fixed tier, by RouteCandidate.est_cost.
+    cost_tiers: Dict[str, str] = field(
+        default_factory=lambda: {"low": "fast", "medium": "standard", "high": "strong"}
+    )
+    default_tier: str = "standard"
+    fallback_model: str = DEFAULT_MODEL
+    prices: Dict[str, Tuple[float, float]] = field(default_factory=lambda: dict(_DEFAULT_PRICES))
+
+    def tier_for(self, agent_id: str, est_cost: str | None = None) -> str:
+        agent = agent_id.split(".", 1)[0]
+        if agent in self.agents:
+            return self.agents[agent]
+        if est_cost and est_cost in self.cost_tiers:
+            return self.cost_tiers[est_cost]
+        return self.default_tier
+
+    def select_model(self, agent_id: str, est_cost: str | None = None) -> str:
+        tier = self.tier_for(agent_id, est_cost)
+        return self.tiers.get(tier) or self.tiers[self.default_tier]
+
+    def estimate_cost(self, model: str, input_tokens: int, output_tokens: int) -> float | None:
+        # Responses may name the model as "models/..."; configs may use "-latest" aliases.
+        price = self.prices.get(model) or self.prices.get(normalize_model_name(model))
+        if price is None:
+            return None
+        return (input_tokens * price[0] + output_tokens * price[1]) / 1_000_000
+
+    def describe(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _load_override(raw: str) -> Dict[str, Any]:
+    text = raw.strip()
+    if not text.startswith("{"):
+        text = Path(text).read_text(encoding="utf-8")
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("MODEL_POLICY must be a JSON object")
+    return data
+
+
+@lru_cache(maxsize=1)
+def get_model_policy() -> ModelPolicy:
+    policy = ModelPolicy()
+    raw = os.getenv("MODEL_POLICY")
+    if not raw:
+        return policy
+    for key, value in _load_override(raw).items():
+        current = getattr(policy, key, None)
+        if isinstance(current, dict) and isinstance(value, dict):
+            current.update({name: tuple(entry) if key == "prices" else entry for name, entry in value.items()})
+        elif hasattr(policy, key):
+            setattr(policy, key, value)
+        else:
+            raise ValueError(f"Unknown MODEL_POLICY key: {key}")
+    return policy
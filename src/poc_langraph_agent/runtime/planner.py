@@ -1,23 +1,55 @@
 """Planner LLM stub that produces linear DAG plans."""
 from __future__ import annotations
 
-from langchain_core.output_parsers import PydanticOutputParser
+from typing import Tuple
+
 from langchain_core.runnables import RunnableLambda
 
 from ..schemas import IntentPayload, Plan, PlannerNode
+from .latency import LATENCY_TRACKER, LatencyTracker
+
+# Cold-start values, used until an agent has MIN_SAMPLES observations.
+DEFAULT_MAX_RETRIES = 2
+MIN_SAMPLES = 20
+# Timeout = observed p99 * headroom, clamped to [floor, default for the agent].
+TIMEOUT_HEADROOM = 1.5
+TIMEOUT_FLOOR_MS = 1000
+
+
+def _default_timeout(agent_id: str) -> int:
+    if "response_agent" in agent_id:
+        return 12000
+    if "refund_agent" in agent_id:
+        return 15000
+    return 8000
+
 
+def _node_limits(agent_id: str, tracker: LatencyTracker) -> Tuple[int, int]:
+    """Derive ``(timeout_ms, max_retries)`` for an agent from observed latency.
 
-def _plan_from_intent(intent: IntentPayload) -> Plan:
+    Retries are cut back as the recent failure rate rises: when most calls
+    fail, another attempt mostly burns the caller's deadline.
+    """
+
+    default_timeout = _default_timeout(agent_id)
+    summary = tracker.summary(agent_id)
+    if summary is None or summary.samples < MIN_SAMPLES:
+        return default_timeout, DEFAULT_MAX_RETRIES
+    timeout = int(min(default_timeout, max(TIMEOUT_FLOOR_MS, summary.p99_ms * TIMEOUT_HEADROOM)))
+    if summary.failure_rate >= 0.5:
+        retries = 0
+    elif summary.failure_rate >= 0.2:
+        retries = 1
+    else:
+        retries = DEFAULT_MAX_RETRIES
+    return timeout, retries
+
+
+def _plan_from_intent(intent: IntentPayload, tracker: LatencyTracker = LATENCY_TRACKER) -> Plan:
     candidate = intent.route_candidates[0]
     nodes = []
     for index, agent_id in enumerate(candidate.agents):
-        if "response_agent" in agent_id:
-            timeout = 12000
-        elif "refund_agent" in agent_id:
-            timeout = 15000
-        else:
-            timeout = 8000
-
+        timeout, retries = _node_limits(agent_id, tracker)
         nodes.append(
             PlannerNode(
                 id=f"step_{index+1}",
@@ -25,7 +57,7 @@ def _plan_from_intent(intent: IntentPayload) -> Plan:
                 input_key="payload",
                 output_key="payload",
                 timeout_ms=timeout,
-                max_retries=2,
+                max_retries=retries,
             )
         )
     return Plan(
@@ -36,13 +68,12 @@ def _plan_from_intent(intent: IntentPayload) -> Plan:
 
 
 def build_planner_chain():
-    parser = PydanticOutputParser(pydantic_object=Plan)
-
     def _predict(data):
         intent = data["intent"]
-        if not isinstance(intent, IntentPayload):
-            intent = IntentPayload.parse_raw(intent)
-        plan = _plan_from_intent(intent)
-        return parser.parse(plan.json())
+        if isinstance(intent, (str, bytes)):
+            intent = IntentPayload.model_validate_json(intent)
+        elif not isinstance(intent, IntentPayload):
+            intent = IntentPayload.model_validate(intent)
+        return _plan_from_intent(intent)
 
     return RunnableLambda(_predict)
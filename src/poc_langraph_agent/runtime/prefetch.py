@@ -0,0 +1,223 @@
+"""Speculative order prefetch overlapping the pre/intent/plan stages.
+
+``run_router`` looks for an order id in the raw input with
+``intent.ORDER_PATTERN`` before the graph runs. If it finds one, a background
+worker loads the order and refund records, and in ``llm`` mode it also runs
+the ``order_agent`` analysis. Meanwhile masking, intent and planning go ahead.
+The executor hands the prefetch to ``order_agent`` only when the plan starts
+with it and resolves the same order id. Otherwise the prefetch is discarded
+and counted as waste.
+
+The speculative LLM call picks its model the way ``order_agent`` will: it runs
+the (rule-based) intent chain on the masked input itself and takes the cost
+estimate of the first route candidate. It is skipped for session turns, which
+may reuse the previous analysis. A wasted call still
+costs tokens; those tokens are reported.
+
+Environment:
+    ORDER_PREFETCH          "off", "data" (default) or "llm"
+    ORDER_PREFETCH_WORKERS  background threads per process (default 4)
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import os
+import threading
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+from ..intent import ORDER_PATTERN
+from ..tools.nodes import analyze_order
+from .datastore import get_order, get_refund
+from .model_policy import get_model_policy
+from .profiling import propagate, stage
+from .safety import mask_pii
+
+MODES = ("off", "data", "llm")
+
+
+@dataclass
+class PrefetchStats:
+    started: int = 0
+    hits: int = 0
+    wasted: int = 0
+    late: int = 0
+    failed: int = 0
+    llm_started: int = 0
+    llm_hits: int = 0
+    llm_wasted: int = 0
+    wasted_input_tokens: int = 0
+    wasted_output_tokens: int = 0
+    wasted_cost_usd: float = 0.0
+
+
+class OrderPrefetch:
+    """One speculative lookup (and optional analysis) for a single request."""
+
+    def __init__(self, prefetcher: "OrderPrefetcher", order_id: str, query: str, model: str | None):
+        self.order_id = order_id
+        self.query = query
+        self.model = model
+        self._prefetcher = prefetcher
+        self._records: concurrent.futures.Future = concurrent.futures.Future()
+        self._analysis: concurrent.futures.Future | None = concurrent.futures.Future() if model else None
+        self._task: concurrent.futures.Future | None = None
+        self._outcome = "wasted"
+        self._used_analysis = False
+        self._finished = False
+
+    def _run(self) -> None:
+        with stage("prefetch"):
+            try:
+                records = (get_order(self.order_id), get_refund(self.order_id) or {})
+            except Exception as exc:
+                self._records.set_exception(exc)
+                if self._analysis is not None:
+                    self._analysis.set_exception(exc)
+                return
+            self._records.set_result(records)
+            # Skip the LLM call if the request already discarded the prefetch.
+            if self._analysis is None or not self._analysis.set_running_or_notify_cancel():
+                return
+            try:
+                result, metrics = analyze_order(self.query, self.order_id, *records, model=self.model)
+            except Exception as exc:
+                self._analysis.set_exception(exc)
+            else:
+                self._analysis.set_result((result, metrics))
+
+    def records(self) -> Tuple[Dict[str, Any] | None, Dict[str, Any]] | None:
+        """``(order_record, refund_record)``, or ``None`` to look them up normally.
+
+        A prefetch still queued behind other requests is cancelled rather than
+        waited for, since it would not be any faster than a direct lookup.
+        """
+
+        if self._task is not None and self._task.cancel():
+            self._outcome = "late"
+            return None
+        try:
+            records = self._records.result()
+        except Exception:
+            self._outcome = "failed"
+            return None
+        self._outcome = "hits"
+        return records
+
+    def analysis(self, query: str, model: str | None) -> Tuple[Any, Dict[str, Any]] | None:
+        """The speculative ``order_agent`` result if it was made for ``query`` and ``model``."""
+
+        if self._outcome != "hits" or self._analysis is None:
+            return None
+        if query != self.query or model != self.model:
+            return None
+        try:
+            analysis = self._analysis.result()
+        except Exception:
+            return None
+        self._used_analysis = True
+        return analysis
+
+    def finish(self) -> None:
+        """Settle the hit/waste counters once the request is done (idempotent)."""
+
+        if self._finished:
+            return
+        self._finished = True
+        if self._task is not None:
+            self._task.cancel()  # not needed any more if it has not started yet
+        self._prefetcher._count(**{self._outcome: 1})
+        if self._analysis is None:
+            return
+        if self._used_analysis:
+            self._prefetcher._count(llm_hits=1)
+            return
+        self._analysis.cancel()  # only succeeds if the analysis never ran
+        self._prefetcher._count(llm_wasted=1)
+        self._analysis.add_done_callback(self._prefetcher._count_wasted_usage)
+
+
+def _estimated_cost(masked: str, pii_types: List[str]) -> str | None:
+    """The intent's ``est_cost``, which ``order_agent`` uses to pick its model tier."""
+
+    from .router import get_intent_chain  # the router imports this module
+
+    intent = get_intent_chain().invoke({"masked_input": masked, "pii_types": pii_types})
+    return intent.route_candidates[0].est_cost if intent.route_candidates else None
+
+
+class OrderPrefetcher:
+    def __init__(self, mode: str = "data", workers: int = 4):
+        if mode not in MODES:
+            raise ValueError(f"Unknown prefetch mode: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self.stats = PrefetchStats()
+        self._lock = threading.Lock()
+        self._pool: concurrent.futures.ThreadPoolExecutor | None = None
+        self._pid: int | None = None
+
+    def _executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        # Recreate after fork: pool threads do not survive into worker processes.
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="order-prefetch"
+                )
+                self._pid = os.getpid()
+            return self._pool
+
+    def _count(self, **deltas: int) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self.stats, name, getattr(self.stats, name) + delta)
+
+    def _count_wasted_usage(self, future: concurrent.futures.Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        _, metrics = future.result()
+        with self._lock:
+            self.stats.wasted_input_tokens += metrics.get("input_tokens") or 0
+            self.stats.wasted_output_tokens += metrics.get("output_tokens") or 0
+            self.stats.wasted_cost_usd += metrics.get("cost_usd") or 0.0
+
+    def start(self, raw_input: str, session_id: str | None = None) -> OrderPrefetch | None:
+        """Start a prefetch if ``raw_input`` names an order; ``None`` otherwise."""
+
+        if self.mode == "off":
+            return None
+        match = ORDER_PATTERN.search(raw_input)
+        if not match:
+            return None
+        # order_agent sees the masked text, so the speculative prompt must too.
+        masked, pii = mask_pii(raw_input)
+        model = None
+        if self.mode == "llm" and not session_id:
+            model = get_model_policy().select_model("order_agent.v1", _estimated_cost(masked, pii))
+        prefetch = OrderPrefetch(self, match.group(0), masked, model)
+        self._count(started=1, llm_started=1 if model else 0)
+        prefetch._task = self._executor().submit(propagate(prefetch._run))
+        return prefetch
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = asdict(self.stats)
+        started, llm_started = stats["started"], stats["llm_started"]
+        stats["wasted_cost_usd"] = round(stats["wasted_cost_usd"], 6)
+        return {
+            "mode": self.mode,
+            **stats,
+            "hit_rate": round(stats["hits"] / started, 3) if started else 0.0,
+            "waste_rate": round(stats["wasted"] / started, 3) if started else 0.0,
+            "llm_hit_rate": round(stats["llm_hits"] / llm_started, 3) if llm_started else 0.0,
+            "llm_waste_rate": round(stats["llm_wasted"] / llm_started, 3) if llm_started else 0.0,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_prefetcher() -> OrderPrefetcher:
+    return OrderPrefetcher(
+        mode=os.getenv("ORDER_PREFETCH", "data").strip().lower() or "data",
+        workers=int(os.getenv("ORDER_PREFETCH_WORKERS", "4")),
+    )
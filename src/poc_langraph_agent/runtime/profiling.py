@@ -0,0 +1,279 @@
+"""Profiling hooks for the router: stage timers plus cProfile or a sampling profiler.
+
+Usage::
+
+    with profile_router(mode="sampling") as profiler:
+        for text in corpus:
+            run_router(text)
+    print(profiler.report())
+    profiler.write_collapsed("router.collapsed")  # flamegraph.pl / speedscope input
+
+Router nodes, agent nodes, LLM calls and response parsing are wrapped in
+``stage()`` blocks, so time is attributed to paths such as
+``executor/order_agent.v1/llm``. ``stage()`` costs one global lookup while no
+profiler is active. A profiler aggregates over every request run inside it,
+so one session can cover a whole batch.
+
+Modes:
+    cprofile  deterministic; profiles the calling thread and agent worker threads
+              (started through ``propagate``; on Python 3.12+ the one profile
+              already covers every thread). Collapsed output is the stage tree
+              weighted by wall time, since cProfile keeps no full stacks.
+    sampling  a background thread samples all Python stacks every
+              ``interval_ms``; collapsed output holds real stacks prefixed with
+              their stage path. Low overhead, suited to large batches.
+"""
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+_STAGE: contextvars.ContextVar[Tuple[str, ...]] = contextvars.ContextVar("router_stage", default=())
+_ACTIVE: "RouterProfiler | None" = None
+_PACKAGE_MARKER = "poc_langraph_agent"
+# From 3.12 cProfile hooks sys.monitoring, which is process-wide: one profile
+# sees all threads and a second one cannot be enabled.
+_PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Attribute the enclosed block to ``name`` under the current stage path."""
+
+    profiler = _ACTIVE
+    if profiler is None:
+        yield
+        return
+    path = _STAGE.get() + (name,)
+    token = _STAGE.set(path)
+    ident = threading.get_ident()
+    previous = profiler._thread_stage.get(ident)
+    profiler._thread_stage[ident] = path
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler._add_stage(path, time.perf_counter() - started)
+        if previous is None:
+            profiler._thread_stage.pop(ident, None)
+        else:
+            profiler._thread_stage[ident] = previous
+        _STAGE.reset(token)
+
+
+def propagate(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a thread-pool target so it keeps the caller's stage path (and is profiled)."""
+
+    if _ACTIVE is None:
+        return fn
+    context = contextvars.copy_context()
+
+    def _run(*args: Any, **kwargs: Any) -> Any:
+        profiler = _ACTIVE
+        if profiler is None:
+            return context.run(fn, *args, **kwargs)
+        ident = threading.get_ident()
+        profiler._thread_stage[ident] = context.get(_STAGE, ())
+        thread_profile = None
+        if profiler.mode == "cprofile" and _PER_THREAD_PROFILES:
+            thread_profile = cProfile.Profile()
+            try:
+                thread_profile.enable()
+            except ValueError:  # another profiler already owns the hook
+                thread_profile = None
+        try:
+            return context.run(fn, *args, **kwargs)
+        finally:
+            if thread_profile is not None:
+                thread_profile.disable()
+                profiler._add_thread_profile(thread_profile)
+            profiler._thread_stage.pop(ident, None)
+
+    return _run
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    marker = filename.rfind(_PACKAGE_MARKER)
+    short = filename[marker:] if marker >= 0 else Path(filename).name
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+def _waiting_on_agent(stack: List[str]) -> bool:
+    """True for the executor thread blocked on an agent future (innermost frame first).
+
+    The agent's own thread is sampled separately, so counting the waiter too
+    would double the agent's time.
+    """
+
+    return stack[0].startswith("wait (") and any(label.startswith("_run_call (") for label in stack)
+
+
+class RouterProfiler:
+    def __init__(self, mode: str = "cprofile", interval_ms: float = 5.0):
+        if mode not in {"cprofile", "sampling"}:
+            raise ValueError(f"Unknown profiler mode: {mode}")
+        self.mode = mode
+        self.interval = interval_ms / 1000
+        self.stages: Dict[Tuple[str, ...], List[float]] = {}
+        self.samples: Counter[str] = Counter()
+        self.wall_seconds = 0.0
+        self._thread_stage: Dict[int, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+        self._profile: cProfile.Profile | None = None
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._sampler: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._started = 0.0
+
+    # -- collection -------------------------------------------------------
+    def _add_stage(self, path: Tuple[str, ...], seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(path, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def _add_thread_profile(self, profile: cProfile.Profile) -> None:
+        with self._lock:
+            self._thread_profiles.append(profile)
+
+    def _sample_loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack: List[str] = []
+                relevant = False
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    relevant = relevant or _PACKAGE_MARKER in frame.f_code.co_filename
+                    frame = frame.f_back
+                if not relevant or _waiting_on_agent(stack):
+                    continue
+                stack.reverse()
+                path = self._thread_stage.get(ident, ())
+                key = ";".join([*(f"[{name}]" for name in path), *stack])
+                with self._lock:
+                    self.samples[key] += 1
+
+    def start(self) -> "RouterProfiler":
+        global _ACTIVE
+        if _ACTIVE is not None:
+            raise RuntimeError("A router profiler is already active")
+        _ACTIVE = self
+        self._started = time.perf_counter()
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample_loop, name="router-sampler", daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        global _ACTIVE
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        self.wall_seconds += time.perf_counter() - self._started
+        _ACTIVE = None
+
+    def __enter__(self) -> "RouterProfiler":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # -- output -----------------------------------------------------------
+    def stage_table(self) -> List[Tuple[str, int, float, float]]:
+        """Rows of ``(stage path, calls, total ms, mean ms)``, slowest first."""
+
+        with self._lock:
+            rows = [
+                ("/".join(path), int(count), total * 1000, total * 1000 / count)
+                for path, (count, total) in self.stages.items()
+            ]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def _pstats(self) -> pstats.Stats | None:
+        profiles = [profile for profile in [self._profile, *self._thread_profiles] if profile is not None]
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0], stream=io.StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def report(self, limit: int = 30) -> str:
+        out = io.StringIO()
+        out.write(f"mode={self.mode} wall={self.wall_seconds * 1000:.1f}ms\n\n")
+        out.write(f"{'stage':<48} {'calls':>7} {'total ms':>11} {'mean ms':>9} {'% wall':>7}\n")
+        wall_ms = self.wall_seconds * 1000 or 1.0
+        for path, calls, total, mean in self.stage_table():
+            out.write(f"{path:<48} {calls:>7} {total:>11.1f} {mean:>9.2f} {total / wall_ms * 100:>6.1f}%\n")
+        out.write("\n")
+        if self.mode == "cprofile":
+            stats = self._pstats()
+            if stats is not None:
+                stats.stream = out
+                stats.sort_stats("cumulative").print_stats(limit)
+        else:
+            total = sum(self.samples.values()) or 1
+            inclusive: Counter[str] = Counter()
+            leaf: Counter[str] = Counter()
+            for key, count in self.samples.items():
+                frames = [part for part in key.split(";") if not part.startswith("[")]
+                for frame in set(frames):
+                    inclusive[frame] += count
+                if frames:
+                    leaf[frames[-1]] += count
+            out.write(f"samples={total} interval={self.interval * 1000:.1f}ms\n")
+            for title, counter in (("self (leaf) samples", leaf), ("inclusive samples", inclusive)):
+                out.write(f"\n{title}:\n")
+                for frame, count in counter.most_common(limit):
+                    out.write(f"{count:>8} {count / total * 100:>6.1f}%  {frame}\n")
+        return out.getvalue()
+
+    def collapsed(self) -> List[str]:
+        """Collapsed-stack lines (``a;b;c <weight>``) for flame graph tools."""
+
+        if self.mode == "sampling":
+            with self._lock:
+                return [f"{key} {count}" for key, count in sorted(self.samples.items())]
+        # Stage tree weighted by self time in microseconds.
+        with self._lock:
+            totals = {path: total for path, (_, total) in self.stages.items()}
+        lines = []
+        for path, total in sorted(totals.items()):
+            children = sum(value for child, value in totals.items() if child[:-1] == path)
+            self_us = int(max(0.0, total - children) * 1_000_000)
+            if self_us:
+                lines.append(f"{';'.join(path)} {self_us}")
+        return lines
+
+    def write_report(self, path: str | Path) -> None:
+        Path(path).write_text(self.report(), encoding="utf-8")
+
+    def write_collapsed(self, path: str | Path) -> None:
+        Path(path).write_text("\n".join(self.collapsed()) + "\n", encoding="utf-8")
+
+
+def profile_router(mode: str = "cprofile", interval_ms: float = 5.0) -> RouterProfiler:
+    """Context manager profiling every ``run_router`` call made inside it."""
+
+    return RouterProfiler(mode=mode, interval_ms=interval_ms)
@@ -1,16 +1,22 @@
 """LangGraph router wiring pre/post safety, intent, planning, and execution."""
 from __future__ import annotations
 
+import time
+from functools import lru_cache
 from typing import Any, Dict
 
 from langgraph.graph import END, StateGraph
 
 from ..intent import build_intent_chain
 from ..schemas import IntentPayload, Plan, RouterState
-from ..tools.nodes import append_agent_trace
+from ..tools.nodes import AgentExecutionError, append_agent_trace
 from .executor import Executor
 from .planner import build_planner_chain
+from .prefetch import get_prefetcher
+from .profiling import stage
 from .safety import contains_forbidden_term, mask_pii
+from .session import get_session_store, record_digest
+from .usage import USAGE_LEDGER
 
 
 def _format_plan_tree(plan: Plan) -> str:
@@ -29,8 +35,22 @@ def _preprocess_node(state: Dict[str, Any]) -> Dict[str, Any]:
     return state
 
 
+@lru_cache(maxsize=1)
+def get_intent_chain():
+    """Return the process-wide intent chain (built on first use)."""
+
+    return build_intent_chain()
+
+
+@lru_cache(maxsize=1)
+def get_planner_chain():
+    """Return the process-wide planner chain (built on first use)."""
+
+    return build_planner_chain()
+
+
 def _intent_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    intent_chain = build_intent_chain()
+    intent_chain = get_intent_chain()
     intent: IntentPayload = intent_chain.invoke(
         {"masked_input": state["masked_input"], "pii_types": state.get("pii_types", [])}
     )
@@ -40,7 +60,7 @@ def _intent_node(state: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def _plan_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    planner_chain = build_planner_chain()
+    planner_chain = get_planner_chain()
     plan: Plan = planner_chain.invoke({"intent": state["intent"]})
     state["plan"] = plan
     state.setdefault("transcript", []).append(plan.plan_id)
@@ -51,24 +71,73 @@ def _plan_node(state: Dict[str, Any]) -> Dict[str, Any]:
         label="PLAN",
         message="그래프 계획 생성 완료",
         dag=_format_plan_tree(plan),
-        plan=plan.dict(),
+        plan=plan.model_dump(),
     )
     return state
 
 
+def _session_context(payload: Dict[str, Any], previous: Dict[str, Any] | None) -> Dict[str, Any]:
+    order = payload.get("order") or {}
+    return {
+        "order_id": payload.get("order_id"),
+        "order_id_inferred": bool(payload.get("order_id_inferred")),
+        # Digests only: the records carry the customer's name and contact details.
+        "order_digest": record_digest(order.get("record")),
+        "refund_digest": record_digest(order.get("refund_record")),
+        "order_agent_result": payload.get("order_agent_result"),
+        "refund_agent_result": payload.get("refund_agent_result")
+        or (previous or {}).get("refund_agent_result"),
+        "turns": (previous or {}).get("turns", 0) + 1,
+    }
+
+
 def _executor_node(state: Dict[str, Any]) -> Dict[str, Any]:
     executor = Executor()
     payload = state.get("payload", {})
     payload.setdefault("query", state["masked_input"])
+    customer = state.pop("customer", None)
+    if customer:
+        payload["customer"] = customer
 
     intent: IntentPayload | None = state.get("intent")
     if intent is not None:
-        payload.setdefault("intent", intent.dict())
-        payload.setdefault("slots", intent.slots.dict())
+        # Dump once and share the nested slots dict instead of dumping it again.
+        intent_data = payload.setdefault("intent", intent.model_dump())
+        payload.setdefault("slots", intent_data["slots"])
         if intent.slots.order_id:
             payload.setdefault("order_id", intent.slots.order_id)
 
-    result = executor.execute(state["plan"], payload)
+    session_id = state.get("session_id")
+    session = get_session_store().get(session_id) if session_id else None
+    if session:
+        payload["session_context"] = session
+        if session.get("order_id") and "order_id" not in payload:
+            payload["order_id"] = session["order_id"]
+            payload["order_id_inferred"] = bool(session.get("order_id_inferred"))
+        state.setdefault("transcript", []).append("session:restored")
+
+    plan: Plan = state["plan"]
+    prefetch = state.pop("prefetch", None)
+    if prefetch is not None:
+        first_agent = plan.nodes[0].agent if plan.nodes else None
+        if first_agent == "order_agent.v1" and prefetch.order_id == payload.get("order_id"):
+            payload["order_prefetch"] = prefetch
+            state.setdefault("transcript", []).append("prefetch:attached")
+        else:
+            prefetch.finish()
+            state.setdefault("transcript", []).append("prefetch:discarded")
+
+    try:
+        result = executor.execute(plan, payload, deadline=state.get("deadline"))
+    except AgentExecutionError as exc:
+        USAGE_LEDGER.record(plan.plan_id, exc.usage)
+        raise
+    result.pop("session_context", None)
+    result.pop("order_prefetch", None)
+    result.pop("customer", None)
+    if session_id:
+        get_session_store().put(session_id, _session_context(result, session))
+    USAGE_LEDGER.record(plan.plan_id, result.get("usage"))
     state["payload"] = result
     state.setdefault("transcript", []).append("executor:done")
     return state
@@ -84,13 +153,21 @@ def _postprocess_node(state: Dict[str, Any]) -> Dict[str, Any]:
     return state
 
 
+def _staged(name: str, node):
+    def _run(state: Dict[str, Any]) -> Dict[str, Any]:
+        with stage(name):
+            return node(state)
+
+    return _run
+
+
 def build_router_graph():
     graph = StateGraph(dict)
-    graph.add_node("pre", _preprocess_node)
-    graph.add_node("intent", _intent_node)
-    graph.add_node("plan", _plan_node)
-    graph.add_node("executor", _executor_node)
-    graph.add_node("post", _postprocess_node)
+    graph.add_node("pre", _staged("pre", _preprocess_node))
+    graph.add_node("intent", _staged("intent", _intent_node))
+    graph.add_node("plan", _staged("plan", _plan_node))
+    graph.add_node("executor", _staged("executor", _executor_node))
+    graph.add_node("post", _staged("post", _postprocess_node))
 
     graph.set_entry_point("pre")
     graph.add_edge("pre", "intent")
@@ -102,8 +179,48 @@ def build_router_graph():
     return graph.compile()
 
 
-def run_router(user_input: str) -> RouterState:
-    graph = build_router_graph()
+@lru_cache(maxsize=1)
+def get_router_graph():
+    """Return the process-wide compiled router graph (compiled on first use)."""
+
+    with stage("graph_compile"):
+        return build_router_graph()
+
+
+def run_router(
+    user_input: str,
+    deadline_ms: int | None = None,
+    session_id: str | None = None,
+    customer: str | None = None,
+) -> RouterState:
+    """Route ``user_input`` end to end.
+
+    ``deadline_ms`` is the caller's budget for the whole request; agent nodes
+    only get what is left of it and retries that cannot finish in time are
+    skipped (raising ``DeadlineExceededError``). With ``session_id`` the
+    order resolved by earlier turns of the conversation is reused. ``customer``
+    is the caller's verified email; without it a request that names no order
+    id is never matched to an existing order. An order id in the input starts a speculative lookup (see ``runtime.prefetch``)
+    that runs alongside masking, intent and planning.
+    """
+
+    graph = get_router_graph()
     state: Dict[str, Any] = {"raw_input": user_input, "masked_input": user_input}
-    result = graph.invoke(state)
-    return RouterState.parse_obj(result)
+    if session_id:
+        state["session_id"] = session_id
+    if customer:
+        state["customer"] = customer
+    if deadline_ms is not None:
+        state["deadline"] = time.monotonic() + deadline_ms / 1000
+    prefetch = get_prefetcher().start(user_input, session_id)
+    if prefetch is not None:
+        state["prefetch"] = prefetch
+    try:
+        result = graph.invoke(state)
+    finally:
+        if prefetch is not None:
+            prefetch.finish()
+    # Intent and plan are already validated instances; Pydantic v2 does not
+    # revalidate them here, so this is the single validation at the boundary.
+    with stage("validate"):
+        return RouterState.model_validate(result)
@@ -0,0 +1,218 @@
+"""Multi-turn session context: in-memory LRU+TTL cache with an optional sqlite tier.
+
+A session remembers what the previous turn resolved (order id, agent
+results) so a follow-up such as "그럼 환불 부탁해요" can reuse them. The order
+and refund records themselves hold customer data and are not stored; only
+their ``record_digest`` is kept, to tell whether they changed since. Configuration (environment):
+
+    SESSION_TTL_SECONDS   idle lifetime of a session (default 1800)
+    SESSION_MAX_ENTRIES   in-memory entry cap (default 10000)
+    SESSION_MAX_BYTES     in-memory size cap, UTF-8 bytes of the JSON (default 32 MiB)
+    SESSION_DB_PATH       sqlite file for the persistence tier (disabled if unset)
+
+With the sqlite tier on, sqlite is the source of truth: a cached entry is
+only served while its expiry stamp still matches the stored row, so a turn
+written by another worker process is never shadowed by a stale copy.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+
+def record_digest(record: Dict[str, Any] | None) -> str | None:
+    """SHA-256 of ``record``'s canonical JSON, or ``None`` for no record."""
+
+    if record is None:
+        return None
+    canonical = json.dumps(
+        record, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SessionStats:
+    hits: int = 0
+    misses: int = 0
+    persistent_hits: int = 0
+    stale: int = 0
+    writes: int = 0
+    expired: int = 0
+    evicted_lru: int = 0
+    evicted_memory: int = 0
+
+
+class SqliteSessionTier:
+    """Write-through persistence so sessions survive restarts and are shared by workers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Reconnect after fork: sqlite handles must not cross process boundaries.
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, session_id: str, now: float) -> Tuple[str, float] | None:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT data, expires_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        return row[0], row[1]
+
+    def stamp(self, session_id: str) -> float | None:
+        """The stored row's ``expires_at``; it changes on every write."""
+
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT expires_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, session_id: str, data: str, expires_at: float) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+                (session_id, data, expires_at),
+            )
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.commit()
+
+
+class SessionStore:
+    """LRU + TTL cache of session contexts bounded by entry count and encoded size."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = 1800,
+        max_entries: int = 10_000,
+        max_bytes: int = 32 * 1024 * 1024,
+        persistent: SqliteSessionTier | None = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.persistent = persistent
+        self.stats = SessionStats()
+        # session_id -> (encoded context, expires_at wall clock, size in bytes)
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, session_id: str) -> None:
+        _, _, size = self._entries.pop(session_id)
+        self._bytes -= size
+
+    def _insert(self, session_id: str, data: str, expires_at: float) -> None:
+        if session_id in self._entries:
+            self._drop(session_id)
+        size = len(data.encode("utf-8"))
+        self._entries[session_id] = (data, expires_at, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.stats.evicted_lru += 1
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+            self.stats.evicted_memory += 1
+
+    def get(self, session_id: str) -> Dict[str, Any] | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry[1] <= now:
+                self._drop(session_id)
+                self.stats.expired += 1
+                entry = None
+        if entry is not None and self.persistent is not None:
+            # Another worker may have written a newer turn since this copy was cached.
+            if self.persistent.stamp(session_id) != entry[1]:
+                with self._lock:
+                    if session_id in self._entries:
+                        self._drop(session_id)
+                    self.stats.stale += 1
+                entry = None
+        if entry is not None:
+            with self._lock:
+                if session_id in self._entries:
+                    self._entries.move_to_end(session_id)
+                self.stats.hits += 1
+            return json.loads(entry[0])
+        stored = self.persistent.get(session_id, now) if self.persistent else None
+        with self._lock:
+            if stored is None:
+                self.stats.misses += 1
+                return None
+            self.stats.persistent_hits += 1
+            self._insert(session_id, *stored)
+        return json.loads(stored[0])
+
+    def put(self, session_id: str, context: Dict[str, Any]) -> None:
+        data = json.dumps(context, ensure_ascii=False, separators=(",", ":"))
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._insert(session_id, data, expires_at)
+            self.stats.writes += 1
+        if self.persistent:
+            self.persistent.put(session_id, data, expires_at)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._entries:
+                self._drop(session_id)
+        if self.persistent:
+            self.persistent.delete(session_id)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats.hits + self.stats.persistent_hits + self.stats.misses
+            return {
+                **asdict(self.stats),
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round((self.stats.hits + self.stats.persistent_hits) / lookups, 3)
+                if lookups
+                else 0.0,
+                "persistent": bool(self.persistent),
+            }
+
+
+@lru_cache(maxsize=1)
+def get_session_store() -> SessionStore:
+    db_path = os.getenv("SESSION_DB_PATH")
+    return SessionStore(
+        ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "1800")),
+        max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "10000")),
+        max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(32 * 1024 * 1024))),
+        persistent=SqliteSessionTier(db_path) if db_path else None,
+    )
@@ -0,0 +1,72 @@
+"""Token, latency and cost accounting for agent LLM calls."""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict
+
+_COUNTERS = ("calls", "input_tokens", "output_tokens", "latency_ms", "cost_usd")
+
+
+def _empty() -> Dict[str, Any]:
+    return {name: 0 for name in _COUNTERS}
+
+
+def _add(target: Dict[str, Any], call: Dict[str, Any]) -> None:
+    target["calls"] += call.get("calls", 1)
+    target["input_tokens"] += call.get("input_tokens") or 0
+    target["output_tokens"] += call.get("output_tokens") or 0
+    target["latency_ms"] = round(target["latency_ms"] + (call.get("latency_ms") or 0), 1)
+    target["cost_usd"] = round(target["cost_usd"] + (call.get("cost_usd") or 0), 8)
+
+
+def record_usage(payload: Dict[str, Any], agent_id: str, call: Dict[str, Any]) -> None:
+    """Fold one LLM call's metrics into ``payload["usage"]`` (per agent and total)."""
+
+    usage = payload.setdefault("usage", {"agents": {}, "total": _empty()})
+    agent = usage["agents"].setdefault(agent_id, {**_empty(), "models": []})
+    _add(agent, call)
+    model = call.get("model")
+    if model and model not in agent["models"]:
+        agent["models"].append(model)
+    _add(usage["total"], call)
+
+
+class UsageLedger:
+    """Process-wide totals per plan and per (plan, agent), for reporting."""
+
+    def __init__(self) -> None:
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, plan_id: str, usage: Dict[str, Any] | None) -> None:
+        if not usage:
+            return
+        with self._lock:
+            plan = self._plans.setdefault(plan_id, {"requests": 0, "total": _empty(), "agents": {}})
+            plan["requests"] += 1
+            _add(plan["total"], usage["total"])
+            for agent_id, totals in usage["agents"].items():
+                _add(plan["agents"].setdefault(agent_id, _empty()), totals)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            report: Dict[str, Any] = {}
+            for plan_id, plan in self._plans.items():
+                requests = plan["requests"] or 1
+                report[plan_id] = {
+                    "requests": plan["requests"],
+                    "total": dict(plan["total"]),
+                    "per_request": {
+                        name: round(value / requests, 8 if name == "cost_usd" else 1)
+                        for name, value in plan["total"].items()
+                    },
+                    "agents": {agent: dict(totals) for agent, totals in plan["agents"].items()},
+                }
+            return report
+
+    def reset(self) -> None:
+        with self._lock:
+            self._plans.clear()
+
+
+USAGE_LEDGER = UsageLedger()
@@ -1,7 +1,7 @@
 """Shared Pydantic schemas for intent detection and planning."""
 from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
 
 
 class RouteCandidate(BaseModel):
@@ -32,7 +32,8 @@ class IntentPayload(BaseModel):
     route_candidates: List[RouteCandidate] = Field(default_factory=list)
     reason: str
 
-    @validator("intent")
+    @field_validator("intent")
+    @classmethod
     def intent_lowercase(cls, value: str) -> str:
         return value.strip().lower()
 
@@ -44,7 +45,8 @@ class OrderAgentResult(BaseModel):
 
 
 class RefundAgentResult(BaseModel):
-    refund_action: Literal["approve", "deny"]
+    # needs_confirmation: the order was not named by the user; nothing is refunded.
+    refund_action: Literal["approve", "deny", "needs_confirmation"]
     refund_id: str
     notes: List[str] = Field(default_factory=list)
 
@@ -68,7 +70,8 @@ class Plan(BaseModel):
     nodes: List[PlannerNode]
     terminal_key: str = "payload"
 
-    @validator("nodes")
+    @field_validator("nodes")
+    @classmethod
     def ensure_linear(cls, value: List[PlannerNode]) -> List[PlannerNode]:
         if not value:
             raise ValueError("Plan must contain at least one node")
@@ -83,6 +86,7 @@ class Plan(BaseModel):
 class RouterState(BaseModel):
     raw_input: str
     masked_input: str
+    session_id: Optional[str] = None
     intent: Optional[IntentPayload] = None
     plan: Optional[Plan] = None
     payload: Dict[str, object] = Field(default_factory=dict)
@@ -0,0 +1,310 @@
+"""Pre-fork HTTP/JSON service for the router.
+
+Run with ``python -m poc_langraph_agent.serve``. The parent process compiles
+the router graph, builds the chains and the order index, opens the listening
+socket and then forks workers that inherit all of it. Each worker serves
+HTTP/1.1 keep-alive connections on a thread per connection, with at most
+``--concurrency`` requests inside the router at once; requests that cannot get
+a slot within ``--queue-timeout`` seconds are rejected with 503.
+
+Endpoints:
+    POST /route    {"input": "...", "deadline_ms": 5000?, "session_id": "..."?, "customer": "..."?}
+                   -> RouterState JSON; "customer" is the caller's verified email,
+                   to be set by the authenticating front end
+    GET  /healthz  {"status": "ok", "pid": ...}
+    GET  /usage    model policy and this worker's token/cost totals per plan
+    GET  /sessions this worker's session cache size and eviction stats
+    GET  /prefetch this worker's speculative order prefetch hit/waste rates
+
+Session contexts live in each worker's memory; set ``SESSION_DB_PATH`` so
+follow-up turns landing on another worker find them in the sqlite tier.
+
+On SIGTERM/SIGINT workers stop accepting connections and let in-flight
+requests finish (up to ``--drain-timeout`` seconds) before exiting. A worker
+that dies soon after starting is respawned with exponential backoff, so a
+worker that crashes on startup does not fork in a tight loop.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict
+
+from dotenv import find_dotenv, load_dotenv
+
+from .runtime.datastore import get_order_index
+from .runtime.llm import MissingAPIKeyError, get_gemini
+from .runtime.model_policy import get_model_policy
+from .runtime.prefetch import get_prefetcher
+from .runtime.prompts import load_prompt
+from .runtime.router import get_intent_chain, get_planner_chain, get_router_graph, run_router
+from .runtime.safety import jitter_backoff
+from .runtime.session import get_session_store
+from .runtime.usage import USAGE_LEDGER
+from .tools.nodes import DeadlineExceededError
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+_PROMPT_NAMES = (
+    "order_agent_system",
+    "order_agent_user",
+    "refund_agent_system",
+    "refund_agent_user",
+    "response_agent_system",
+    "response_agent_user",
+)
+_MAX_BODY_BYTES = 64 * 1024
+# A worker exiting sooner than this after its start counts as a crash loop.
+_MIN_WORKER_UPTIME_S = 5.0
+_RESPAWN_BASE_DELAY_S = 0.5
+_RESPAWN_MAX_DELAY_S = 30.0
+
+
+def warm_up() -> None:
+    """Load everything a request would otherwise pay for on first use."""
+
+    get_router_graph()
+    get_intent_chain()
+    get_planner_chain()
+    get_order_index()
+    get_model_policy()
+    get_prefetcher()
+    for name in _PROMPT_NAMES:
+        load_prompt(name)
+
+
+class RouterRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "RouterHTTPServer"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: bytes | Dict[str, Any]) -> None:
+        if isinstance(body, dict):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok", "pid": os.getpid()})
+            return
+        if self.path == "/usage":
+            self._send_json(
+                200,
+                {
+                    "pid": os.getpid(),
+                    "policy": get_model_policy().describe(),
+                    "plans": USAGE_LEDGER.report(),
+                },
+            )
+            return
+        if self.path == "/sessions":
+            self._send_json(200, {"pid": os.getpid(), **get_session_store().report()})
+            return
+        if self.path == "/prefetch":
+            self._send_json(200, {"pid": os.getpid(), **get_prefetcher().report()})
+            return
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        if self.path != "/route":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = 0
+        if length <= 0 or length > _MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send_json(400, {"error": "missing, invalid or oversized Content-Length"})
+            return
+        try:
+            request = json.loads(self.rfile.read(length))
+            user_input = str(request["input"])
+            deadline_ms = request.get("deadline_ms")
+            deadline_ms = int(deadline_ms) if deadline_ms is not None else None
+            session_id = request.get("session_id")
+            session_id = str(session_id) if session_id else None
+            customer = request.get("customer")
+            customer = str(customer) if customer else None
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self._send_json(400, {"error": "body must be JSON with an 'input' field"})
+            return
+
+        if self.server.draining:
+            self.close_connection = True
+            self._send_json(503, {"error": "worker shutting down"})
+            return
+        if not self.server.slots.acquire(timeout=self.server.queue_timeout):
+            self._send_json(503, {"error": "worker saturated"})
+            return
+        try:
+            result = run_router(
+                user_input, deadline_ms=deadline_ms, session_id=session_id, customer=customer
+            )
+        except DeadlineExceededError as exc:
+            self._send_json(504, {"error": str(exc)})
+            return
+        except Exception as exc:  # surface agent failures as JSON instead of dropping the connection
+            self._send_json(500, {"error": str(exc)})
+            return
+        finally:
+            self.server.slots.release()
+        self._send_json(200, result.model_dump_json().encode("utf-8"))
+
+
+class RouterHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, sock: socket.socket, concurrency: int, queue_timeout: float, verbose: bool):
+        super().__init__(sock.getsockname()[:2], RouterRequestHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.concurrency = concurrency
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.queue_timeout = queue_timeout
+        self.verbose = verbose
+        self.draining = False
+
+    def drain(self, timeout: float) -> bool:
+        """Wait until no request is inside the router; ``False`` on timeout."""
+
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        taken = 0
+        try:
+            while taken < self.concurrency:
+                if not self.slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    return False
+                taken += 1
+            return True
+        finally:
+            for _ in range(taken):
+                self.slots.release()
+
+
+def _worker(sock: socket.socket, args: argparse.Namespace) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        # Model clients hold sockets/threads that must not be shared across fork.
+        policy = get_model_policy()
+        for model in {*policy.tiers.values(), policy.fallback_model}:
+            get_gemini(model)
+    except MissingAPIKeyError:
+        pass  # reported per request by the agent nodes
+    server = RouterHTTPServer(sock, args.concurrency, args.queue_timeout, args.verbose)
+    # shutdown() blocks until serve_forever() returns, so it cannot run in the
+    # handler, which executes on the thread running serve_forever().
+    signal.signal(
+        signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start()
+    )
+    server.serve_forever()
+    if not server.drain(args.drain_timeout):
+        print(f"worker {os.getpid()}: requests still running after drain timeout", file=sys.stderr)
+
+
+def _spawn(sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            _worker(sock, args)
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(args: argparse.Namespace) -> None:
+    warm_up()
+    sock = socket.create_server((args.host, args.port), backlog=args.backlog, reuse_port=False)
+    started: Dict[int, float] = {}
+    for _ in range(args.workers):
+        started[_spawn(sock, args)] = time.monotonic()
+    print(
+        f"router service on http://{args.host}:{sock.getsockname()[1]} "
+        f"(workers={args.workers}, concurrency={args.concurrency})",
+        file=sys.stderr,
+        flush=True,
+    )
+
+    stopping = False
+
+    def _stop(*_: Any) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(started):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    crashes = 0
+    while started:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        if pid not in started or stopping:
+            started.pop(pid, None)
+            continue
+        uptime = time.monotonic() - started.pop(pid)
+        crashes = crashes + 1 if uptime < _MIN_WORKER_UPTIME_S else 0
+        if crashes:
+            delay = min(_RESPAWN_MAX_DELAY_S, jitter_backoff(_RESPAWN_BASE_DELAY_S, crashes - 1))
+            print(
+                f"worker {pid} exited (code {os.waitstatus_to_exitcode(status)}) after {uptime:.1f}s; "
+                f"respawning in {delay:.1f}s",
+                file=sys.stderr,
+                flush=True,
+            )
+            until = time.monotonic() + delay
+            while not stopping and time.monotonic() < until:
+                time.sleep(0.1)
+            if stopping:
+                continue
+        started[_spawn(sock, args)] = time.monotonic()
+    sock.close()
+
+
+def main() -> None:
+    dotenv_path = find_dotenv(usecwd=True) or PROJECT_ROOT / ".env"
+    load_dotenv(dotenv_path, override=True)
+
+    parser = argparse.ArgumentParser(description="Serve the MCP router over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--concurrency", type=int, default=4, help="Max in-flight requests per worker")
+    parser.add_argument("--queue-timeout", type=float, default=5.0, help="Seconds to wait for a slot")
+    parser.add_argument("--backlog", type=int, default=512)
+    parser.add_argument(
+        "--drain-timeout", type=float, default=30.0, help="Seconds a stopping worker waits for in-flight requests"
+    )
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    serve(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
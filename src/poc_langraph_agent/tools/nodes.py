@@ -2,29 +2,45 @@
 from __future__ import annotations
 
 import json
+import time
 import uuid
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Callable, Dict, Type
+from typing import Any, Callable, Dict, List, Tuple, Type
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import BaseMessage
 
+from ..runtime.attempt import guarded_write
+from ..runtime.cassette import CassetteMissError, exchange_key, get_cassette, variables_hash
+from ..runtime.compaction import compact_variables, estimate_tokens
 from ..runtime.datastore import (
+    find_orders,
     generate_order_id,
     get_order,
-    load_refunds,
+    get_refund,
     record_order,
     record_refund,
 )
 from ..runtime.llm import MissingAPIKeyError, get_gemini
+from ..runtime.model_policy import get_model_policy
+from ..runtime.profiling import stage
 from ..runtime.prompts import load_prompt
+from ..runtime.session import record_digest
+from ..runtime.usage import record_usage
 from ..schemas import OrderAgentResult, RefundAgentResult, ResponseAgentResult
 
 
 class AgentExecutionError(RuntimeError):
     """Raised when an agent node fails irrecoverably."""
 
+    # Tokens spent by the failed request, attached by the executor.
+    usage: Dict[str, Any] | None = None
+
+
+class DeadlineExceededError(AgentExecutionError):
+    """Raised when the request deadline leaves no budget for the next attempt."""
+
 
 @dataclass
 class NodeSpec:
@@ -34,12 +50,6 @@ class NodeSpec:
     handler: Callable[[Dict[str, Any]], Dict[str, Any]]
 
 
-def _format_json(data: Any) -> str:
-    if not data:
-        return "{}"
-    return json.dumps(data, ensure_ascii=False, indent=2)
-
-
 def _extract_text(message: Any) -> str:
     if isinstance(message, str):
         return message
@@ -78,32 +88,49 @@ def append_agent_trace(
     trace.append(entry)
 
 
-def _call_structured_agent(
-    system_name: str,
-    user_name: str,
-    output_schema: Type,
-    variables: Dict[str, Any],
-    *,
-    allow_text_fallback: bool = False,
-):
-    system_prompt = load_prompt(system_name)
-    user_prompt = load_prompt(user_name)
-    prompt = ChatPromptTemplate.from_messages(
-        [("system", system_prompt), ("human", user_prompt)]
+def _capture_usage(metrics: Dict[str, Any], response: Any, model: str | None, latency_ms: float) -> None:
+    usage = getattr(response, "usage_metadata", None) or {}
+    response_meta = getattr(response, "response_metadata", None) or {}
+    model_name = model or response_meta.get("model_name") or "default"
+    input_tokens = usage.get("input_tokens") or metrics.get("prompt_tokens_est", 0)
+    output_tokens = usage.get("output_tokens") or 0
+    metrics.update(
+        model=model_name,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        usage_reported=bool(usage),
+        latency_ms=round(latency_ms, 1),
+        cost_usd=get_model_policy().estimate_cost(model_name, input_tokens, output_tokens),
     )
+
+
+def _select_model(payload: Dict[str, Any], agent_id: str) -> str:
+    candidates = (payload.get("intent") or {}).get("route_candidates") or []
+    est_cost = candidates[0].get("est_cost") if candidates else None
+    return get_model_policy().select_model(agent_id, est_cost)
+
+
+def _invoke_llm(messages: List[BaseMessage], model: str | None) -> Tuple[Any, str | None, float]:
+    """Call the model, returning (response, model used, start time of the successful call)."""
+
     try:
-        llm = get_gemini()
+        llm = get_gemini(model)
     except MissingAPIKeyError as exc:
         raise AgentExecutionError(str(exc)) from exc
-    chain = prompt | llm
+    started = time.perf_counter()
     try:
-        response = chain.invoke(variables)
+        response = llm.invoke(messages)
     except Exception:
         # One-off fallback to a more widely available model if initial request fails
-        llm = get_gemini("gemini-2.5-flash")
-        chain = prompt | llm
-        response = chain.invoke(variables)
-    text = _extract_text(response).strip()
+        model = get_model_policy().fallback_model
+        llm = get_gemini(model)
+        started = time.perf_counter()
+        response = llm.invoke(messages)
+    return response, model, started
+
+
+def _parse_structured(raw_text: str, output_schema: Type, allow_text_fallback: bool):
+    text = raw_text.strip()
     if text.startswith("```"):
         text = text.strip("`\n\t ")
         if text.lower().startswith("json"):
@@ -124,24 +151,175 @@ def _call_structured_agent(
         raise AgentExecutionError(f"Validation error: {payload}") from exc
 
 
-def order_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
-    order_id = payload.get("order_id") or payload.get("slots", {}).get("order_id")
-    query = payload.get("query", "")
-    refunds = load_refunds()
-    order_record = get_order(order_id) if order_id else None
-    result: OrderAgentResult = _call_structured_agent(
+def _call_structured_agent(
+    system_name: str,
+    user_name: str,
+    output_schema: Type,
+    variables: Dict[str, Any],
+    *,
+    allow_text_fallback: bool = False,
+    metrics: Dict[str, Any] | None = None,
+    model: str | None = None,
+    usage_payload: Dict[str, Any] | None = None,
+    agent_id: str | None = None,
+    order_id: str | None = None,
+):
+    """Call the model and parse its reply into ``output_schema``.
+
+    With ``usage_payload`` the call's tokens are recorded there as soon as
+    the model answers, so replies that fail to parse are still accounted.
+    ``order_id`` only feeds the record/replay key.
+    """
+
+    system_prompt = load_prompt(system_name)
+    user_prompt = load_prompt(user_name)
+    prompt = ChatPromptTemplate.from_messages(
+        [("system", system_prompt), ("human", user_prompt)]
+    )
+    messages = prompt.format_messages(**variables)
+    if metrics is not None:
+        prompt_text = "".join(str(message.content) for message in messages)
+        metrics["prompt_chars"] = len(prompt_text)
+        metrics["prompt_tokens_est"] = estimate_tokens(prompt_text)
+    cassette = get_cassette()
+    key = exchange_key(system_name, user_name, variables.get("user_query"), order_id) if cassette else ""
+    digest = variables_hash(variables) if cassette else None
+    started = time.perf_counter()
+    with stage("llm"):
+        if cassette is not None and cassette.replaying:
+            try:
+                response = cassette.replay(key, system_name, digest)
+            except CassetteMissError as exc:
+                raise AgentExecutionError(str(exc)) from exc
+            model = response.response_metadata.get("model_name") or model
+        else:
+            response, model, started = _invoke_llm(messages, model)
+    latency_ms = (time.perf_counter() - started) * 1000
+    if metrics is not None:
+        _capture_usage(metrics, response, model, latency_ms)
+        if usage_payload is not None and agent_id:
+            record_usage(usage_payload, agent_id, metrics)
+    raw_text = _extract_text(response)
+    if cassette is not None and not cassette.replaying:
+        cassette.record(
+            key=key,
+            system_name=system_name,
+            user_name=user_name,
+            query=variables.get("user_query"),
+            variables=digest,
+            messages=messages,
+            response_text=raw_text,
+            usage=getattr(response, "usage_metadata", None),
+            model=model,
+            latency_ms=latency_ms,
+        )
+    with stage("parse"):
+        return _parse_structured(raw_text, output_schema, allow_text_fallback)
+
+
+def analyze_order(
+    query: str,
+    order_id: str | None,
+    order_record: Dict[str, Any] | None,
+    refund_record: Dict[str, Any],
+    *,
+    candidates: List[Dict[str, Any]] | None = None,
+    model: str | None = None,
+    usage_payload: Dict[str, Any] | None = None,
+) -> Tuple[OrderAgentResult, Dict[str, Any]]:
+    """Run the order_agent LLM analysis; returns the result and its prompt/usage metrics.
+
+    Usage is recorded into ``usage_payload`` when given (the speculative
+    prefetch leaves it out and records only if its result is used).
+    """
+
+    compacted, metrics = compact_variables(
+        "order_agent",
+        {
+            "order_record": order_record,
+            "order_candidates": candidates or [],
+            "refund_record": refund_record,
+        },
+    )
+    result = _call_structured_agent(
         "order_agent_system",
         "order_agent_user",
         OrderAgentResult,
-        {
-            "user_query": query,
-            "order_id": order_id or "UNKNOWN",
-            "order_record": _format_json(order_record),
-            "refund_record": _format_json(refunds.get(order_id, {})),
-        },
+        {"user_query": query, "order_id": order_id or "UNKNOWN", **compacted},
+        metrics=metrics,
+        model=model,
+        usage_payload=usage_payload,
+        agent_id="order_agent.v1",
+        order_id=order_id,
+    )
+    return result, metrics
+
+
+def order_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
+    order_id = payload.get("order_id") or payload.get("slots", {}).get("order_id")
+    query = payload.get("query", "")
+    prefetch = payload.pop("order_prefetch", None)
+    prefetched = prefetch.records() if prefetch is not None and prefetch.order_id == order_id else None
+    if prefetched is not None:
+        order_record, refund_record = prefetched
+    else:
+        order_record = get_order(order_id) if order_id else None
+    # An id kept from an earlier turn stays inferred until the user names it.
+    inferred = bool(order_id and payload.get("order_id_inferred"))
+    customer = payload.get("customer")
+    candidates: list[Dict[str, Any]] = []
+    if not order_id and customer:
+        # Only the caller's own orders are candidates; item names alone match
+        # other customers' orders and must never resolve one.
+        candidates = find_orders(
+            customer=customer,
+            item_query=query,
+            time_hint=payload.get("slots", {}).get("time_hint"),
+        )
+        if len(candidates) == 1:
+            # Still a guess: fine for status answers, never enough to act on.
+            resolved = dict(candidates[0])
+            order_id = resolved.pop("order_id")
+            order_record = resolved
+            inferred = True
+    if prefetched is None:
+        refund_record = (get_refund(order_id) if order_id else None) or {}
+    session = payload.get("session_context") or {}
+    reused_session = bool(
+        order_id
+        and session.get("order_agent_result")
+        and session.get("order_id") == order_id
+        and session.get("order_digest") == record_digest(order_record)
+        and session.get("refund_digest") == record_digest(refund_record)
     )
+    speculative = None
+    if reused_session:
+        # Same order, unchanged records: the previous turn's analysis still holds.
+        result = OrderAgentResult.model_validate(session["order_agent_result"])
+        metrics: Dict[str, Any] = {"reused_session": True}
+    else:
+        model = _select_model(payload, "order_agent.v1")
+        speculative = prefetch.analysis(query, model) if prefetched is not None else None
+        if speculative is not None:
+            result, metrics = speculative
+            record_usage(payload, "order_agent.v1", metrics)
+        else:
+            result, metrics = analyze_order(
+                query,
+                order_id,
+                order_record,
+                refund_record,
+                candidates=candidates,
+                model=model,
+                usage_payload=payload,
+            )
+    prefetch_use = "analysis" if speculative is not None else "records" if prefetched is not None else None
     created_new_order = False
-    if not order_record and result.order_status.lower() == "new_order_created":
+    if (
+        not order_record
+        and not candidates
+        and result.order_status.lower() == "new_order_created"
+    ):
         new_order_id = order_id or generate_order_id()
         now = datetime.utcnow()
         order_record = {
@@ -154,18 +332,23 @@ def order_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
             "notes": f"신규 주문 생성: {query}",
             "created_at": now.isoformat() + "Z",
         }
-        record_order(new_order_id, order_record)
+        with guarded_write():
+            record_order(new_order_id, order_record)
         order_id = new_order_id
         created_new_order = True
 
+    analysis = result.model_dump()
     payload["order_id"] = order_id
+    payload["order_id_inferred"] = inferred
     payload["order"] = {
         "order_id": order_id,
+        "inferred": inferred,
         "record": order_record,
-        "analysis": result.dict(),
+        "refund_record": refund_record,
+        "analysis": analysis,
         "created": created_new_order,
     }
-    payload["order_agent_result"] = result.dict()
+    payload["order_agent_result"] = analysis
     append_agent_trace(
         payload,
         agent_id="order_agent.v1",
@@ -178,30 +361,66 @@ def order_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
         status=result.order_status,
         created=created_new_order,
         order_id=order_id,
+        inferred=inferred,
+        candidates=[candidate["order_id"] for candidate in candidates],
+        reused_session=reused_session,
+        prefetched=prefetch_use,
+        prompt=metrics,
+    )
+    return payload
+
+
+def _request_order_confirmation(payload: Dict[str, Any], order_id: str | None) -> Dict[str, Any]:
+    """Hold the refund and ask the user to name the order."""
+
+    note = (
+        f"주문번호 확인 필요: {order_id} 주문이 맞는지 주문번호와 함께 다시 요청해 주세요."
+        if order_id
+        else "주문번호 확인 필요: 환불할 주문의 주문번호를 알려 주세요."
+    )
+    result = RefundAgentResult(refund_action="needs_confirmation", refund_id="", notes=[note])
+    refund_result = result.model_dump()
+    payload["refund"] = {"order_id": order_id, "result": refund_result, "order_record": None}
+    payload["refund_agent_result"] = refund_result
+    append_agent_trace(
+        payload,
+        agent_id="refund_agent.v1",
+        label="REFUND",
+        message=f"환불 보류, 주문번호 확인 요청 (추정 주문: {order_id or '없음'})",
+        action=result.refund_action,
+        order_id=order_id,
     )
     return payload
 
 
 def refund_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
     order_id = payload.get("order_id")
-    if not order_id:
-        raise AgentExecutionError("order_id missing in payload")
     order_result = payload.get("order_agent_result")
     if not order_result:
         raise AgentExecutionError("order agent result missing")
+    if not order_id or payload.get("order_id_inferred"):
+        # Never refund an order the user did not name.
+        return _request_order_confirmation(payload, order_id)
 
     order_record = get_order(order_id)
-    refunds = load_refunds()
+    compacted, metrics = compact_variables(
+        "refund_agent",
+        {
+            "order_agent_result": order_result,
+            "order_record": order_record,
+            "refund_record": get_refund(order_id) or {},
+        },
+    )
     result: RefundAgentResult = _call_structured_agent(
         "refund_agent_system",
         "refund_agent_user",
         RefundAgentResult,
-        {
-            "user_query": payload.get("query", ""),
-            "order_agent_result": _format_json(order_result),
-            "order_record": _format_json(order_record),
-            "refund_record": _format_json(refunds.get(order_id, {})),
-        },
+        {"user_query": payload.get("query", ""), **compacted},
+        metrics=metrics,
+        model=_select_model(payload, "refund_agent.v1"),
+        usage_payload=payload,
+        agent_id="refund_agent.v1",
+        order_id=order_id,
     )
 
     refund_id = result.refund_id
@@ -213,14 +432,17 @@ def refund_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
             notes=result.notes,
         )
 
-    record_refund(order_id, result.refund_action, result.notes)
+    if result.refund_action != "needs_confirmation":
+        with guarded_write():
+            record_refund(order_id, result.refund_action, result.notes)
 
+    refund_result = result.model_dump()
     payload["refund"] = {
         "order_id": order_id,
-        "result": result.dict(),
+        "result": refund_result,
         "order_record": order_record,
     }
-    payload["refund_agent_result"] = result.dict()
+    payload["refund_agent_result"] = refund_result
     append_agent_trace(
         payload,
         agent_id="refund_agent.v1",
@@ -229,6 +451,7 @@ def refund_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
         action=result.refund_action,
         refund_id=refund_id,
         order_found=bool(order_record),
+        prompt=metrics,
     )
     return payload
 
@@ -236,16 +459,21 @@ def refund_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
 def response_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
     order_result = payload.get("order_agent_result") or {}
     refund_result = payload.get("refund_agent_result") or {}
+    compacted, metrics = compact_variables(
+        "response_agent",
+        {"order_agent_result": order_result, "refund_agent_result": refund_result},
+    )
     result: ResponseAgentResult = _call_structured_agent(
         "response_agent_system",
         "response_agent_user",
         ResponseAgentResult,
-        {
-            "user_query": payload.get("query", ""),
-            "order_agent_result": _format_json(order_result),
-            "refund_agent_result": _format_json(refund_result),
-        },
+        {"user_query": payload.get("query", ""), **compacted},
         allow_text_fallback=True,
+        metrics=metrics,
+        model=_select_model(payload, "response_agent.v1"),
+        usage_payload=payload,
+        agent_id="response_agent.v1",
+        order_id=payload.get("order_id"),
     )
     payload["response"] = result.message
     append_agent_trace(
@@ -253,6 +481,7 @@ def response_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
         agent_id="response_agent.v1",
         label="RESPONSE",
         message="최종 답변 생성 완료",
+        prompt=metrics,
     )
     return payload
 